@@ -1,8 +1,13 @@
+import os
+import sys
 import random
 
+# Share the word store of the solvers in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from word_store import WordStore
+
 def load_words(path="words.txt"):
-    with open(path, 'r') as f:
-        return f.read().splitlines()
+    return WordStore.load(path)
 
 def get_feedback(guess, word):
     """Generate Wordle-style feedback for the guess."""
@@ -37,11 +42,11 @@ def main():
             while True:
                 guess = input(f"Attempt {attempt}/{attempts}: ").strip().upper()
 
-                if len(guess) == 5:
+                if len(guess) == words.length:
                     break
                 if guess.lower() == 'q':
                     raise Exception("Game quitted.")
-                print(f"Invalid input. Please enter a 5-letter word.")
+                print(f"Invalid input. Please enter a {words.length}-letter word.")
 
             if guess == answer:
                 print("Congratulations! You guessed the word correctly!")
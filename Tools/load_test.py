@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import numpy as np
+from collections import defaultdict
+
+# Share the feedback of the solvers in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from solvers import get_feedback, load_words
+
+async def play(host, port, answers, latencies, attempts, solver, search_all):
+    """One client playing its games one after another on its own connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def call(**request):
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies[request['op']].append(time.perf_counter() - start)
+
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    for answer in answers:
+        session = (await call(op="new_game", solver=solver, search_all=search_all))['session']
+        for attempt in range(1, 20):
+            guess = (await call(op="next_guess", session=session))['guess']
+            if guess == answer:
+                break
+            await call(op="submit_feedback", session=session, feedback=get_feedback(guess, answer))
+        attempts.append(attempt)
+        await call(op="end_game", session=session)
+
+    writer.close()
+
+async def load_test(host, port, clients, games, solver, search_all, seed=0):
+    """Play games sampled with a fixed seed across concurrent clients, and print throughput and latencies"""
+    words = load_words()
+    answers = random.Random(seed).choices(words, k=games)
+
+    latencies = defaultdict(list)
+    attempts = []
+    start = time.perf_counter()
+    await asyncio.gather(*(play(host, port, answers[i::clients], latencies, attempts, solver, search_all)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    requests = sum(len(times) for times in latencies.values())
+    print(f"{solver} search_all={search_all}: {games} games by {clients} clients in {elapsed:.2f}s")
+    print(f"{games / elapsed:.1f} games/s, {requests / elapsed:.1f} requests/s, average attempts {np.mean(attempts):.4f}")
+
+    print(f"{'op':<16}{'calls':>8}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'max_ms':>10}")
+    for op, times in sorted(latencies.items()):
+        p50, p95, p99 = np.percentile(np.array(times) * 1000, (50, 95, 99))
+        print(f"{op:<16}{len(times):>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{max(times) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    # Start server.py first
+    host = "127.0.0.1"
+    port = 8765
+
+    clients = 50    # concurrent connections
+    games = 1000    # games over all clients
+
+    solver = "Bayesian"
+    search_all = True
+
+    asyncio.run(load_test(host, port, clients, games, solver, search_all))
@@ -1,44 +1,46 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 
-# Data for plotting
-solvers_data = {
-    "BayesianAll": {
-        "x": (1, 2, 3, 4, 5, 6),
-        "y": (1, 47, 1022, 1136, 100, 3)
-    },
-    "BayesianFiltered": {
-        "x": (1, 2, 3, 4, 5, 6, 7, 8),
-        "y": (1, 131, 987, 923, 208, 47, 10, 2)
-    },
-    "MinimaxAll": {
-        "x": (1, 2, 3, 4, 5, 6),
-        "y": (1, 40, 811, 1293, 160, 4)
-    },
-    "MinimaxFiltered": {
-        "x": (1, 2, 3, 4, 5, 6, 7, 8),
-        "y": (1, 122, 877, 1006, 242, 46, 12, 3)
-    },
-    "HeuristicAll": {
-        "x": (1, 2, 3, 4, 5, 6, 7),
-        "y": (1, 104, 771, 1113, 271, 37, 12)
-    },
-    "HeuristicFiltered": {
-        "x": (1, 2, 3, 4, 5, 6, 7, 8),
-        "y": (1, 145, 865, 990, 254, 40, 11, 3)
-    },
-    "Fixed": {
-        "x": (1, 2, 3, 4, 5, 6, 7, 8, 9),
-        "y": (1, 109, 654, 925, 449, 133, 27, 10, 1)
-    },
-}
+# Share the results store of test.py in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from results import ResultsDB
+
+RESULTS_PATH = "results.db"
+
+# Data for plotting: attempt histogram and mean time per turn of every stored run
+def load_runs(path=RESULTS_PATH):
+    with ResultsDB(path) as results:
+        # Latest run of every name
+        runs = {run['name']: run for run in results.runs() if run['played']}
+
+        solvers_data = {}
+        for run in runs.values():
+            x, y = zip(*sorted(results.histogram(run['id']).items()))
+            turns = sorted(results.turn_times(run['id']).items())
+
+            status = "" if run['finished'] else f", {run['played']}/{run['words']} played"
+            label = f"{run['name']} ({run['avg_attempts']:.4f}{status})"
+            solvers_data[label] = {
+                "x": x,
+                "y": y,
+                "turns": [turn for turn, _ in turns],
+                "ms": [1000 * sum(times) / len(times) for _, times in turns],
+            }
+    return solvers_data
+
+solvers_data = load_runs()
+if not solvers_data:
+    raise SystemExit(f"No results in {RESULTS_PATH}, run test.py first")
 
 # Function to toggle visibility of lines
 def toggle_visibility():
     for label, var in checkbox_states.items():
         lines[label].set_visible(var.get())  # Show/hide line based on checkbox state
+        time_lines[label].set_visible(var.get())
     
     # Update legend to only show visible lines
     visible_lines = [line for label, line in lines.items() if checkbox_states[label].get()]
@@ -62,20 +64,27 @@ root = tk.Tk()
 root.title("Solver Comparison")
 root.protocol("WM_DELETE_WINDOW", quit)  # Bind the close button to quit() function
 
-# Create Matplotlib figure
-fig, ax = plt.subplots()
+# Create Matplotlib figure: attempts on the left, time per turn on the right
+fig, (ax, time_ax) = plt.subplots(1, 2, figsize=(12, 5))
 
 # Plot all solvers initially
 lines = {}
+time_lines = {}
 for label, data in solvers_data.items():
     line, = ax.plot(data["x"], data["y"], label=label, marker='o', visible=True)
     lines[label] = line
+    time_lines[label], = time_ax.plot(data["turns"], data["ms"], color=line.get_color(), marker='o', visible=True)
 
 ax.set_xlabel("Attempts")
 ax.set_ylabel("Frequency")
 ax.set_title("Solver Comparison")
 ax.legend()
 
+time_ax.set_xlabel("Turn")
+time_ax.set_ylabel("Mean time per guess (ms)")
+time_ax.set_yscale("log")
+time_ax.set_title("Time per Turn")
+
 # Embed Matplotlib figure into Tkinter
 canvas = FigureCanvasTkAgg(fig, master=root)
 canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
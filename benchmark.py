@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import numpy as np
+from collections import defaultdict
+from solvers import *
+from decision_tree import TreeDB
+
+# Cases timed for every solver:
+#   guess_first, guess_mid, guess_late: construct_guess with all the words, after one feedback, after two or more
+#   filter_words: filter_words alone on every turn of the games
+#   tree_miss, tree_hit: TreeDB.get_node on a fresh tree (solver and insert), then the same games again
+CASES = ("guess_first", "guess_mid", "guess_late", "filter_words", "tree_miss", "tree_hit")
+
+def timed(setup, call, repeat):
+    # Best of repeat runs of call, with setup run untimed before each of them
+    best = float("inf")
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def record_games(agent, answers):
+    """
+    Play the answers without cache or tree and return the turns of every game:
+    (state before the guess, guess, feedback), the feedback is None for the winning guess
+    """
+    turns = []
+    for answer in answers:
+        agent.reset()
+        while True:
+            state = agent.get_state()
+            guess = agent.make_guess()
+            if guess == answer:
+                turns.append((state, guess, None))
+                break
+            feedback = get_feedback(guess, answer)
+            turns.append((state, guess, feedback))
+            agent.filter_words(guess, feedback)
+    agent.reset()
+    return turns
+
+def time_tree(agent, answers, path):
+    # Seconds of every get_node call on a fresh tree, then on the same games once the tree holds them
+    times = defaultdict(list)
+    tree = TreeDB(repr(agent), path=path, words_hash=agent.matrix.digest)
+
+    for case in ("tree_miss", "tree_hit"):
+        for answer in answers:
+            feedback = None
+            while True:
+                missed = False
+
+                def make_guess():
+                    nonlocal missed
+                    missed = True
+                    return agent.make_guess()
+
+                start = time.perf_counter()
+                guess = tree.get_node(make_guess, feedback)
+                seconds = time.perf_counter() - start
+                # The first pass also reaches nodes added by earlier games
+                times["tree_miss" if missed else "tree_hit"].append(seconds)
+
+                if guess == answer:
+                    break
+                feedback = get_feedback(guess, answer)
+                agent.filter_words(guess, feedback)
+            agent.reset()
+        tree.flush()
+
+    tree.close()
+    return times
+
+def benchmark(agent, answers, repeat=3):
+    """Seconds of every call of every case, each call the best of repeat runs"""
+    times = defaultdict(list)
+
+    for state, guess, feedback in record_games(agent, answers):
+        turn = len(state[1])
+        if len(state[0]) > 2:
+            case = "guess_first" if turn == 0 else "guess_mid" if turn == 1 else "guess_late"
+            # The opening state is the same for every game, time it once
+            if case != "guess_first" or not times[case]:
+                times[case].append(timed(lambda: agent.set_state(state), agent.construct_guess, repeat))
+
+        if feedback is not None:
+            times["filter_words"].append(timed(lambda: agent.set_state(state), lambda: agent.filter_words(guess, feedback), repeat))
+    agent.reset()
+
+    with tempfile.TemporaryDirectory() as directory:
+        times.update(time_tree(agent, answers, os.path.join(directory, "tree.db")))
+    return times
+
+def summarize(times):
+    # Median, 95th percentile and total in ms of every case
+    summary = {}
+    for case in CASES:
+        if times.get(case):
+            ms = np.array(times[case]) * 1000
+            summary[case] = {
+                'calls': len(ms),
+                'median_ms': round(float(np.median(ms)), 4),
+                'p95_ms': round(float(np.percentile(ms, 95)), 4),
+                'total_ms': round(float(ms.sum()), 4),
+            }
+    return summary
+
+def compare(results, baseline, threshold, min_ms=0.05):
+    """
+    Cases whose median is slower than the baseline by more than threshold (0.25 is 25%).
+    Differences below min_ms are timer noise and never count.
+    """
+    regressions = []
+    for solver, cases in results.items():
+        for case, stats in cases.items():
+            base = baseline.get(solver, {}).get(case)
+            if base is None:
+                continue
+            now, before = stats['median_ms'], base['median_ms']
+            if now > before * (1 + threshold) and now - before > min_ms:
+                regressions.append((solver, case, before, now))
+    return regressions
+
+def table(results, baseline=None):
+    lines = [f"{'solver':<20}{'case':<14}{'calls':>7}{'median_ms':>12}{'p95_ms':>12}{'total_ms':>12}{'baseline':>12}{'change':>9}"]
+    for solver, cases in results.items():
+        for case, stats in cases.items():
+            line = f"{solver:<20}{case:<14}{stats['calls']:>7}{stats['median_ms']:>12}{stats['p95_ms']:>12}{stats['total_ms']:>12}"
+            base = (baseline or {}).get(solver, {}).get(case)
+            if base is not None:
+                before = base['median_ms']
+                line += f"{before:>12}{(stats['median_ms'] / before - 1 if before else 0):>+9.1%}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Solvers benchmarked in both search modes
+    solvers = [Bayesian, Minimax, Heuristic]
+    modes = [True, False]
+
+    # Answers sampled with a fixed seed, every solver plays the same games
+    seed = 0
+    answers = 100
+
+    # Every call is the best of repeat runs
+    repeat = 3
+
+    # Fail when the median of a case is slower than the baseline by more than threshold
+    baseline_path = "benchmark.json"
+    threshold = 0.25
+
+    # Write the results as the new baseline instead of comparing with it
+    update_baseline = not os.path.exists(baseline_path)
+
+    db = load_words()
+    sample = random.Random(seed).sample(list(db), answers)
+    settings = {'seed': seed, 'answers': answers, 'repeat': repeat, 'words_hash': db.digest}
+
+    results = {}
+    for solver in solvers:
+        for search_all in modes:
+            # No cache: every guess is computed
+            agent = solver(db, search_all, cache_size=0)
+            results[repr(agent)] = summarize(benchmark(agent, sample, repeat))
+            print(f"{agent} done")
+
+    if update_baseline:
+        machine = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(), 'processor': platform.processor()}
+        with open(baseline_path, 'w') as f:
+            json.dump({'settings': settings, 'machine': machine, 'results': results}, f, indent=2)
+        print(table(results))
+        print(f"Baseline written to {baseline_path}")
+        sys.exit(0)
+
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    if baseline['settings'] != settings:
+        sys.exit(f"{baseline_path} was recorded with other settings or words, set update_baseline = True")
+
+    print(table(results, baseline['results']))
+    regressions = compare(results, baseline['results'], threshold)
+    for solver, case, before, now in regressions:
+        print(f"Regression: {solver} {case} {before} ms -> {now} ms")
+    sys.exit(1 if regressions else 0)
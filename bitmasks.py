@@ -0,0 +1,143 @@
+import time
+import numpy as np
+from collections import Counter
+from patterns import as_store, encode_feedback
+
+class LetterMasks:
+    """
+    Word list as bitsets over the words, bit i standing for word i: one mask per letter
+    and position, and one per letter and minimum count. Filtering by a feedback and the
+    feedback of a guess against many words are AND/OR of masks, one Python int each.
+    """
+    def __init__(self, words):
+        self.words = as_store(words)
+        self.length = self.words.length
+        self.size = len(self.words)
+        self.all = (1 << self.size) - 1
+
+        # positions[p][c]: words with letter c at position p
+        self.positions = [[self.pack(self.words.codes[:, p] == c) for c in range(26)] for p in range(self.length)]
+        # at_least[c][n]: words with n or more letters c, n from 0 to length
+        self.at_least = [[self.pack(self.words.counts[:, c] >= n) for n in range(self.length + 1)] for c in range(26)]
+
+    def pack(self, flags):
+        # Mask of a boolean array over the words
+        return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+    def flags(self, mask):
+        # Boolean array over the words of a mask
+        data = np.frombuffer(mask.to_bytes(-(-self.size // 8), 'little'), dtype=np.uint8)
+        return np.unpackbits(data, bitorder='little', count=self.size).view(bool)
+
+    def mask(self, ids):
+        flags = np.zeros(self.size, dtype=bool)
+        flags[ids] = True
+        return self.pack(flags)
+
+    def ids(self, mask):
+        return np.flatnonzero(self.flags(mask))
+
+    def letters(self, guess):
+        if len(guess) != self.length:
+            raise ValueError(f"'{guess}' has {len(guess)} letters, expected {self.length}")
+        return [ord(g) - ord('A') for g in guess]
+
+    # --- Filtering ---
+    def constraint(self, guess, feedback):
+        """Mask of the words that give this feedback to the guess, same as match_feedback"""
+        mask = self.all
+        required = Counter()    # green and yellow letters
+        absent = set()          # letters with a gray mark: the word has exactly the required count
+
+        for p, (c, f) in enumerate(zip(self.letters(guess), feedback)):
+            if f == 1:
+                mask &= self.positions[p][c]
+            else:
+                mask &= ~self.positions[p][c]
+            if f == -1:
+                absent.add(c)
+            else:
+                required[c] += 1
+
+        for c, n in required.items():
+            mask &= self.at_least[c][n]
+        for c in absent:
+            mask &= ~self.at_least[c][required[c] + 1]
+        return mask
+
+    def filter(self, ids, guess, feedback):
+        # Words among ids matching the feedback
+        return ids[self.flags(self.constraint(guess, feedback))[ids]]
+
+    # --- Feedback ---
+    def feedback_masks(self, guess, mask=None):
+        """
+        (green, yellow): mask per position of the words among mask for which the guess
+        letter is green or yellow, the same marks as get_feedback
+        """
+        mask = self.all if mask is None else mask
+        letters = self.letters(guess)
+        green = [self.positions[p][c] & mask for p, c in enumerate(letters)]
+        yellow = [0] * self.length
+
+        # Yellows of a letter depend on how many of its positions are green: split the
+        # words by the set of green positions, then the k-th other position is yellow
+        # for the words with at least greens + k of the letter
+        for c in set(letters):
+            spots = [p for p, letter in enumerate(letters) if letter == c]
+            for subset in range(1 << len(spots)):
+                words = mask
+                for i, p in enumerate(spots):
+                    words &= green[p] if subset >> i & 1 else ~green[p]
+                if not words:
+                    continue
+
+                greens = bin(subset).count("1")
+                others = [p for i, p in enumerate(spots) if not subset >> i & 1]
+                for k, p in enumerate(others, start=1):
+                    if greens + k > self.length:
+                        break
+                    yellow[p] |= words & self.at_least[c][greens + k]
+        return green, yellow
+
+    def patterns(self, guess, ids):
+        """Base-3 pattern codes of the guess against the words ids, as encode_feedback"""
+        green, yellow = self.feedback_masks(guess, self.mask(ids))
+        codes = np.zeros(len(ids), dtype=np.intp)
+        for p in range(self.length):
+            codes = codes * 3 + 2 * self.flags(green[p])[ids] + self.flags(yellow[p])[ids]
+        return codes.astype(np.uint8 if 3 ** self.length <= 256 else np.uint16)
+
+
+if __name__ == "__main__":
+    # Cross-check with get_feedback and match_feedback over every guess and word of the list
+    from solvers import Handler, get_feedback, load_words
+
+    words = load_words()
+    masks = LetterMasks(words)
+    match_feedback = Handler.match_feedback
+    ids = np.arange(len(words))
+    mismatches = 0
+
+    start = time.perf_counter()
+    for guess in words:
+        codes = masks.patterns(guess, ids)
+        feedbacks = [get_feedback(guess, word) for word in words]
+
+        # Every pattern, and every candidate set of every pattern
+        expected = np.array([encode_feedback(f) for f in feedbacks])
+        mismatches += int((codes != expected).sum())
+        for code in np.unique(expected):
+            feedback = feedbacks[int(np.argmax(expected == code))]
+            mismatches += masks.constraint(guess, feedback) != masks.mask(np.flatnonzero(expected == code))
+
+        # match_feedback of every word against the feedback of the next word, mostly rejected
+        constraints = {}
+        for i, word in enumerate(words):
+            feedback = feedbacks[(i + 1) % len(words)]
+            key = encode_feedback(feedback)
+            if key not in constraints:
+                constraints[key] = masks.constraint(guess, feedback)
+            mismatches += bool(constraints[key] >> i & 1) != match_feedback(None, guess, word, feedback)
+
+    print(f"{len(words)} x {len(words)} checked in {time.perf_counter() - start:.1f}s, {mismatches} mismatches")
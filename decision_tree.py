@@ -1,51 +1,364 @@
+import time
 import sqlite3
+import threading
+import numpy as np
+from collections import deque
+from patterns import decode_feedback, encode_feedback, pattern_count
+
+# Version of the stored trees. Trees of an older version, or without build information,
+# were grown by older solvers and are never served
+TREE_VERSION = 2
+
+def table_name(name, words_hash=None):
+    # Trees of the same solver on different word lists are stored side by side
+    return f"{name}-{words_hash[:12]}" if words_hash else name
+
+def trusted(meta, words_hash=None):
+    # Whether the nodes of a tree with this build information can be served
+    if meta is None or meta.get('version') != TREE_VERSION:
+        return False
+    return words_hash is None or meta['words_hash'] == words_hash
+
+class TreeCursor:
+    """
+    Position of one game in a decision tree. Cursors are immutable, so any number of
+    games can walk the same tree at the same time from threads or asyncio tasks.
+    """
+    def __init__(self, tree, id=0):
+        self.tree = tree
+        self.id = id    # 0 before the first guess
+    
+    def advance(self, feedback=None, make_guess=None):
+        """
+        Return the next guess and the cursor after it. feedback is None for the first guess.
+        On a miss make_guess is asked for the guess, or KeyError is raised without it.
+        """
+        id, guess = self.tree.lookup(self.id, feedback, make_guess)
+        return guess, TreeCursor(self.tree, id)
 
 class TreeDB:
-    """A decision tree using SQLite for storage"""
-    def __init__(self, name, path='tree.db'):
-        self.name = name
-        self.id = 0
+    """
+    A decision tree using SQLite for storage. Each word list (words_hash, the digest of the
+    solver's matrix) gets a table of its own, and a tree of an older version is cleared on open.
+    """
+    def __init__(self, name, path='tree.db', batch_size=100, words_hash=None):
+        self.name = table_name(name, words_hash)
+        self.words_hash = words_hash
+
+        # Inserts are committed in batches of this size
+        self.batch_size = batch_size
+        self.pending = 0
 
-        self.conn = sqlite3.connect(path)
+        # One connection is shared by every game, guarded by the lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
         self.c = self.conn.cursor()
+        self.lock = threading.RLock()
+        self.cursor = self.root()   # position of get_node
+
+        # Trees written before feedback was stored as a pattern code, under the bare solver
+        # name, were grown with the old filtering and their guesses can't be trusted
+        for table in {name, self.name}:
+            self.c.execute(f'PRAGMA table_info("{table}")')
+            if {column[1]: column[2] for column in self.c.fetchall()}.get('feedback') == 'TEXT':
+                self.c.execute(f'DROP TABLE "{table}"')
 
         # Create the main table if it doesn't exist
+        # feedback is the pattern code of the parent's guess (NULL at the root)
+        # and (pid, feedback) is indexed so every lookup is a single index seek
         self.c.execute(f'''
         CREATE TABLE IF NOT EXISTS "{self.name}" (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            feedback TEXT,
+            id INTEGER PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            feedback INTEGER,
             guess TEXT,
-            pid INTEGER,
-            FOREIGN KEY (pid) REFERENCES "{self.name}"(id)
+            UNIQUE (pid, feedback)
+        );
+        ''')
+
+        # Build information of every tree, complete once compiled
+        self.c.execute('''
+        CREATE TABLE IF NOT EXISTS tree_meta (
+            name TEXT PRIMARY KEY,
+            solver TEXT,
+            words_hash TEXT,
+            nodes INTEGER,
+            max_depth INTEGER,
+            avg_depth REAL,
+            build_time REAL,
+            complete INTEGER,
+            version INTEGER
         );
         ''')
+        self.c.execute('PRAGMA table_info(tree_meta)')
+        if 'version' not in {column[1] for column in self.c.fetchall()}:
+            self.c.execute('ALTER TABLE tree_meta ADD COLUMN version INTEGER')
+
+        if not trusted(self.get_meta(), words_hash):
+            # Nodes grown by older solvers, start over
+            self.c.execute(f'DELETE FROM "{self.name}"')
+            self.c.execute('INSERT OR REPLACE INTO tree_meta (name, solver, words_hash, complete, version) VALUES (?, ?, ?, 0, ?)',
+                           (self.name, self.name, words_hash, TREE_VERSION))
         self.conn.commit()
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *_):
+        self.close()
+    
+    def insert(self, feedback, guess, pid):
+        # Insert a node and commit once a batch is full
+        with self.lock:
+            id = self.conn.execute(f'INSERT INTO "{self.name}" (feedback, guess, pid) VALUES (?, ?, ?)', (feedback, guess, pid)).lastrowid
+
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.flush()
+
+        return id
+    
+    def flush(self):
+        # Commit the pending inserts
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+    
+    def find(self, id, code):
+        # (id, guess) of the child of node id for the pattern code, or None
+        with self.lock:
+            if code is None:
+                # If no feedback, we are at the root node
+                return self.conn.execute(f'SELECT id, guess FROM "{self.name}" WHERE id = 1').fetchone()
+            return self.conn.execute(f'SELECT id, guess FROM "{self.name}" WHERE pid = ? AND feedback = ?', (id, code)).fetchone()
+    
+    def lookup(self, id, feedback, make_guess=None):
+        # (id, guess) of the child of node id for the feedback, asking make_guess on a miss
+        code = encode_feedback(feedback) if feedback else None
+        if result := self.find(id, code):
+            return result
+
+        if make_guess is None:
+            raise KeyError(f"{self.name} has no node for feedback {feedback} at node {id}")
+
+        # The solver runs outside the lock so other games are not blocked
+        guess = make_guess()
+
+        with self.lock:
+            # Another game may have added the same node in the meantime
+            if result := self.find(id, code):
+                return result
+            return self.insert(code, guess, id if code is not None else 0), guess
+    
+    def root(self):
+        """Cursor at the start of a new game"""
+        return TreeCursor(self)
+    
     def get_node(self, make_guess, feedback):
+        # Single game interface: no feedback starts a new game from the root
+        if not feedback:
+            self.cursor = self.root()
+
+        guess, self.cursor = self.cursor.advance(feedback, make_guess)
+        return guess
+    
+    def get_meta(self):
+        # Build information of the tree, complete is 1 once compiled
+        self.c.execute('SELECT * FROM tree_meta WHERE name = ?', (self.name,))
+        if row := self.c.fetchone():
+            return dict(zip((column[0] for column in self.c.description), row))
+    
+    def compile(self, agent):
+        """
+        Walk every reachable feedback branch of the agent breadth-first from the root
+        and store the complete tree. An interrupted build resumes from the stored nodes.
+        """
+        start = time.time()
+        words_hash = agent.matrix.digest
+        all_green = pattern_count(agent.matrix.length) - 1
+        if self.words_hash not in (None, words_hash):
+            raise ValueError(f"{self.name} is the tree of another word list than {agent}")
+
+        meta = self.get_meta()
+        if not trusted(meta, words_hash) or meta['solver'] != repr(agent):
+            # Nodes grown for another word list or solver can't be trusted, start over
+            self.c.execute(f'DELETE FROM "{self.name}"')
+            meta = {'build_time': 0}
+        self.c.execute('INSERT OR REPLACE INTO tree_meta (name, solver, words_hash, build_time, complete, version) VALUES (?, ?, ?, ?, 0, ?)',
+                       (self.name, repr(agent), words_hash, meta['build_time'] or 0, TREE_VERSION))
+        self.conn.commit()
+
+        # Root node
+        agent.reset()
+        self.c.execute(f'SELECT id, guess FROM "{self.name}" WHERE id = 1')
+        if not (root := self.c.fetchone()):
+            guess = agent.make_guess()
+            self.c.execute(f'INSERT INTO "{self.name}" (id, feedback, guess, pid) VALUES (1, NULL, ?, 0)', (guess,))
+            root = (1, guess)
+
+        nodes = depths = solved = max_depth = 0
+        queue = deque([(*root, [])])   # (id, guess, path of (guess, feedback) from the root)
+        while queue:
+            node_id, guess, path = queue.popleft()
+            depth = len(path) + 1
+            nodes += 1
+
+            # Restore the agent to this node by replaying the path
+            agent.reset()
+            for g, f in path:
+                agent.filter_words(g, f)
+            
+            patterns = agent.matrix.patterns(agent.matrix.index[guess], agent.ids)
+            if (patterns == all_green).any():
+                solved += 1
+                depths += depth
+                max_depth = max(max_depth, depth)
+
+            self.c.execute(f'SELECT feedback, id, guess FROM "{self.name}" WHERE pid = ?', (node_id,))
+            children = {feedback: (child_id, child_guess) for feedback, child_id, child_guess in self.c.fetchall()}
+
+            for code in np.unique(patterns).tolist():
+                if code == all_green:
+                    continue
+
+                feedback = decode_feedback(code, agent.matrix.length)
+                if code not in children:
+                    # Missing branch, let the solver pick the guess
+                    agent.reset()
+                    for g, f in path + [(guess, feedback)]:
+                        agent.filter_words(g, f)
+                    child_guess = agent.make_guess()
+                    children[code] = (self.insert(code, child_guess, node_id), child_guess)
+
+                queue.append((*children[code], path + [(guess, feedback)]))
+        
+        build_time = (meta['build_time'] or 0) + time.time() - start
+        self.c.execute('UPDATE tree_meta SET nodes = ?, max_depth = ?, avg_depth = ?, build_time = ?, complete = 1 WHERE name = ?',
+                       (nodes, max_depth, depths / solved, build_time, self.name))
+        self.conn.commit()
+        agent.reset()
+
+        return self.get_meta()
+    
+    def close(self):
+        # Write the pending inserts and close the database connection
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+
+class TreeSnapshot:
+    """
+    Read only in-memory copy of a decision tree for fast serving.
+    With fallback, misses are answered by the solver and kept in memory only, and a missing
+    or untrusted tree (see TreeDB) is served as an empty one. Without it, ValueError is raised.
+    """
+    def __init__(self, name, path='tree.db', fallback=False, words_hash=None):
+        self.name = table_name(name, words_hash)
+        self.fallback = fallback
+
+        rows = self.read(path, words_hash)
+        if rows is None:
+            if not fallback:
+                raise ValueError(f"{path} has no usable tree {self.name}, grow it with TreeDB or compile it first")
+            rows = []
+
+        size = max((row[0] for row in rows), default=0) + 1
+        length = len(rows[0][3]) if rows else 0
+        self.patterns = pattern_count(length)
+
+        # guesses[id] is the guess of a node, children[pid, code] the id of its child (0 if missing)
+        self.guesses = [None] * size
+        self.children = np.zeros((size, self.patterns), dtype=np.int32)
+        for id, pid, feedback, guess in rows:
+            self.guesses[id] = guess
+            if feedback is not None:
+                self.children[pid, feedback] = id
+
+        # Nodes added by the solver on a miss
+        self.extra = {}
+        self.lock = threading.Lock()
+        self.cursor = self.root()   # position of get_node
+    
+    def read(self, path, words_hash):
+        # Every node of the tree, or None if it is missing or can't be trusted. No connection is kept open
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        except sqlite3.OperationalError:
+            return None
+
+        try:
+            cursor = conn.execute('SELECT * FROM tree_meta WHERE name = ?', (self.name,))
+            row = cursor.fetchone()
+            meta = dict(zip((column[0] for column in cursor.description), row)) if row else None
+            if not trusted(meta, words_hash):
+                return None
+            return conn.execute(f'SELECT id, pid, feedback, guess FROM "{self.name}"').fetchall()
+        except sqlite3.OperationalError:
+            return None     # no such table, or a tree_meta of an older version
+        finally:
+            conn.close()
+
+    def __len__(self):
+        return sum(guess is not None for guess in self.guesses)
+    
+    def lookup(self, id, feedback, make_guess=None):
+        # (id, guess) of the child of node id for the feedback
         if feedback:
-            # Convert feedback to a string for easier querying
-            feedback = ''.join(map(str, feedback))
-            self.c.execute(f'SELECT id, guess FROM "{self.name}" WHERE pid = ? AND feedback = ?', (self.id, feedback))
+            code = encode_feedback(feedback)
+            child = int(self.children[id, code]) if id < len(self.children) else 0
+            child = child or self.extra.get((id, code), 0)
         else:
             # If no feedback, we are at the root node
-            self.c.execute(f'SELECT id, guess FROM "{self.name}" WHERE id = 1')
+            code = None
+            child = 1 if len(self.guesses) > 1 and self.guesses[1] else self.extra.get((0, None), 0)
 
-        if result := self.c.fetchone():
-            # If a result is found, update the id and return the guess
-            self.id = result[0]
-            return result[1]
+        if child:
+            return child, self.guesses[child]
 
-        # If no result is found, insert the new guess into the database        
-        guess = make_guess()
+        if not self.fallback or make_guess is None:
+            raise KeyError(f"{self.name} has no node for feedback {feedback} at node {id}")
 
-        self.c.execute(f'INSERT INTO "{self.name}" (feedback, guess, pid) VALUES (?, ?, ?)', (feedback, guess, self.id))
-        self.conn.commit()
+        # Ask the solver and keep the new node in memory
+        guess = make_guess()
+        with self.lock:
+            if (id, code) not in self.extra:
+                self.guesses.append(guess)
+                self.extra[(id, code)] = len(self.guesses) - 1
+            child = self.extra[(id, code)]
 
-        self.id = self.c.lastrowid
+        return child, self.guesses[child]
+    
+    def root(self):
+        """Cursor at the start of a new game"""
+        return TreeCursor(self)
+    
+    def get_node(self, make_guess, feedback):
+        # Single game interface: no feedback starts a new game from the root
+        if not feedback:
+            self.cursor = self.root()
 
+        guess, self.cursor = self.cursor.advance(feedback, make_guess)
         return guess
     
     def close(self):
-        # Close the database connection
-        self.conn.close()
+        # Nothing to close, kept for the TreeDB interface
+        pass
+
+
+if __name__ == "__main__":
+    from solvers import *
+
+    # Compile the complete decision tree of a solver
+    # Bayesian, Minimax, Heuristic, Lookahead, Fixed
+    Solver = Bayesian
+    search_all = True
+
+    # File of every allowed guess, None allows only the answers
+    guesses_path = None
+    hard = False    # hard mode trees are stored under their own name
+
+    agent = Solver(load_words(), search_all, guesses=load_words(guesses_path) if guesses_path else None, hard=hard)
 
+    with TreeDB(agent.__repr__(), batch_size=1000, words_hash=agent.matrix.digest) as tree:
+        print("Compiling:", agent)
+        print(tree.compile(agent))
@@ -0,0 +1,393 @@
+import os
+import struct
+import numpy as np
+
+from word_store import WordStore, words_digest
+
+# Feedback digits in a pattern code: -1 (absent) -> 0, 0 (misplaced) -> 1, 1 (exact) -> 2
+# The first letter is the most significant digit, so the all-green pattern is 3 ** length - 1
+
+def pattern_count(length):
+    """Number of distinct feedback patterns for words of the given length"""
+    return 3 ** length
+
+def pattern_dtype(length):
+    # uint8 holds every 5-letter pattern (0..242), longer words need uint16
+    return np.uint8 if pattern_count(length) <= 256 else np.uint16
+
+def encode_feedback(feedback):
+    """Encode a feedback list such as [-1, 1, 1, 0, -1] as a base-3 integer"""
+    code = 0
+    for f in feedback:
+        code = code * 3 + f + 1
+    return code
+
+def decode_feedback(code, length):
+    """Decode a base-3 pattern code back to a feedback list"""
+    feedback = [-1] * length
+    for i in range(length - 1, -1, -1):
+        code, digit = divmod(int(code), 3)
+        feedback[i] = digit - 1
+    return feedback
+
+def as_store(words):
+    # Plain word lists are encoded and validated once here
+    return words if isinstance(words, WordStore) else WordStore(words)
+
+def pattern_block(g_codes, a_codes):
+    """Pattern codes of every guess against every answer, from their letter codes"""
+    length = g_codes.shape[1]
+    green = g_codes[:, None, :] == a_codes[None, :, :]
+    free = ~green
+    shape = green.shape[:2]
+
+    codes = np.zeros(shape, dtype=pattern_dtype(length))
+    for i in range(length):
+        letter = g_codes[:, i, None]
+
+        # Copies of the letter left in the answer once exact matches are removed
+        available = np.zeros(shape, dtype=np.uint8)
+        for k in range(length):
+            available += (letter == a_codes[None, :, k]) & free[:, :, k]
+
+        # Copies already claimed by earlier misplaced letters of the guess
+        used = np.zeros(shape, dtype=np.uint8)
+        for j in range(i):
+            used += (g_codes[:, j, None] == letter) & free[:, :, j]
+
+        yellow = free[:, :, i] & (used < available)
+        codes = codes * 3 + green[:, :, i] * codes.dtype.type(2) + yellow
+
+    return codes
+
+def build_matrix(guesses, answers, chunk_size=256):
+    """Compute the pattern code of every guess against every answer"""
+    g_codes, a_codes = as_store(guesses).codes, as_store(answers).codes
+    matrix = np.empty((len(g_codes), len(a_codes)), dtype=pattern_dtype(g_codes.shape[1]))
+
+    for start in range(0, len(g_codes), chunk_size):
+        matrix[start:start + chunk_size] = pattern_block(g_codes[start:start + chunk_size], a_codes)
+
+    return matrix
+
+
+# --- Cache ---
+CACHE_PATH = "patterns.bin"
+CACHE_MAGIC = b"WFBM"
+CACHE_VERSION = 1
+
+# magic, version, word length, rows, columns, word list digest; padded to HEADER_SIZE bytes
+HEADER = struct.Struct("<4sHHII32s")
+HEADER_SIZE = 64
+
+def save_matrix(path, matrix, length, digest):
+    """Write the matrix to a cache file, atomically replacing any previous version"""
+    header = HEADER.pack(CACHE_MAGIC, CACHE_VERSION, length, *matrix.shape, bytes.fromhex(digest))
+
+    # Write to a private file first so readers never see a partial matrix
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            f.write(np.ascontiguousarray(matrix).tobytes())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_matrix(path, length, rows, cols, digest):
+    """Memory-map a cached matrix, or return None if it is missing or stale"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
+
+    dtype = np.dtype(pattern_dtype(length))
+    expected = (CACHE_MAGIC, CACHE_VERSION, length, rows, cols, bytes.fromhex(digest))
+    if len(header) < HEADER_SIZE or HEADER.unpack_from(header) != expected:
+        return None     # written for another word list or by another version
+    if size != HEADER_SIZE + rows * cols * dtype.itemsize:
+        return None     # truncated
+
+    # Read-only shared mapping: every process opening the cache uses the same physical pages
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(rows, cols))
+
+
+# Largest matrix kept in memory or in the cache file, bigger word lists compute patterns on demand
+MAX_MATRIX_BYTES = 1 << 30
+# Pattern cells computed at once when streaming, bounds the temporary arrays (~length bytes per cell each)
+STREAM_CELLS = 1 << 20
+
+class FeedbackMatrix:
+    """
+    Pattern codes of every allowed guess against every answer, built once per word list.
+    Rows are the answers followed by the other allowed guesses, so an answer has the same
+    row and column index. Matrices above max_bytes are never built, blocks of patterns are
+    computed from the letter codes when needed instead.
+    """
+    def __init__(self, words, path=None, guesses=None, max_bytes=MAX_MATRIX_BYTES):
+        self.words = as_store(words)
+        self.guesses = self.words
+        if guesses is not None:
+            extra = [word for word in as_store(guesses) if word not in self.words]
+            if extra:
+                self.guesses = WordStore(list(self.words) + extra, "allowed guesses")
+
+        self.length = self.words.length
+        self.index = self.guesses.index
+        self.codes = self.guesses.codes
+        self.digest = self.words.digest if self.guesses is self.words \
+            else words_digest([self.words.digest, self.guesses.digest])
+
+        # Every pattern at once, or None to stream them
+        itemsize = np.dtype(pattern_dtype(self.length)).itemsize
+        self.streaming = len(self.guesses) * len(self.words) * itemsize > max_bytes
+        if self.streaming:
+            self.data = None
+        else:
+            self.data = self.load(path) if path else build_matrix(self.guesses, self.words)
+
+    def load(self, path):
+        # Open the cached matrix, rebuilding it if the word list has changed
+        digest = self.digest
+        shape = (len(self.guesses), len(self.words))
+
+        data = load_matrix(path, self.length, *shape, digest)
+        if data is None:
+            data = build_matrix(self.guesses, self.words)
+            try:
+                save_matrix(path, data, self.length, digest)
+            except OSError:
+                return data     # read-only location, keep the matrix in memory
+            data = load_matrix(path, self.length, *shape, digest)
+
+        return data
+
+    def __len__(self):
+        return len(self.words)
+
+    def block(self, guesses, candidates):
+        # Pattern codes of the guesses (rows) against the candidates (columns)
+        if self.data is not None:
+            return self.data[np.ix_(guesses, candidates)]
+
+        codes = self.codes[candidates]
+        result = np.empty((len(guesses), len(candidates)), dtype=pattern_dtype(self.length))
+        step = max(1, STREAM_CELLS // max(len(candidates), 1))
+        for start in range(0, len(guesses), step):
+            result[start:start + step] = pattern_block(self.codes[guesses[start:start + step]], codes)
+        return result
+
+    def patterns(self, guess, candidates):
+        # Pattern codes of one guess row against the candidates
+        if self.data is not None:
+            return self.data[guess, candidates]
+        return self.block(np.array([guess]), candidates)[0]
+
+    def row(self, guess):
+        # Pattern codes of the guess against every word
+        return self.patterns(self.index[guess], np.arange(len(self.words)))
+
+    def columns(self, words):
+        # Column indices of the given words
+        return self.words.ids(words)
+
+    def pattern(self, guess, word):
+        return int(self.patterns(self.index[guess], [self.words.index[word]])[0])
+
+
+_matrices = {}
+
+def get_matrix(words, path=CACHE_PATH, guesses=None):
+    """Return the shared feedback matrix of a word list, loading or building it on first use"""
+    key = words.digest if isinstance(words, WordStore) else words_digest(words)
+    if guesses is not None:
+        key = words_digest([key, guesses.digest if isinstance(guesses, WordStore) else words_digest(guesses)])
+    if path:
+        # Each word list and allowed guesses list gets a cache file of its own, named by its digest
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{key[:12]}{ext}"
+
+    if key not in _matrices:
+        _matrices[key] = FeedbackMatrix(words, path, guesses)
+    return _matrices[key]
+
+
+# --- Scoring ---
+def histograms(matrix, guesses, candidates):
+    """Number of candidates behind each feedback pattern, one row per guess"""
+    patterns = pattern_count(matrix.length)
+    block = matrix.block(guesses, candidates)
+
+    # Shift each row into its own range of bins and count them all at once
+    offsets = np.arange(len(guesses))[:, None] * patterns
+    counts = np.bincount((block + offsets).ravel(), minlength=len(guesses) * patterns)
+    return counts.reshape(len(guesses), patterns)
+
+def entropy_of(counts, total):
+    # Sorting makes guesses with the same bucket sizes score exactly the same
+    counts = np.sort(counts, axis=1)
+    p = counts / total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.where(counts > 0, p * np.log2(p), 0).sum(axis=1)
+
+def score_guesses(matrix, candidates, guesses, block_size=1 << 22):
+    """
+    Score every guess against the remaining candidates at once.
+    Returns the entropy, the worst-case bucket size and the expected remaining size per guess.
+    """
+    total = len(candidates)
+
+    entropy = np.empty(len(guesses))
+    worst = np.empty(len(guesses), dtype=np.intp)
+    expected = np.empty(len(guesses))
+
+    # Bound the size of the histogram block to keep memory flat for big word lists
+    chunk_size = max(1, block_size // max(total, 1))
+    for start in range(0, len(guesses), chunk_size):
+        counts = histograms(matrix, guesses[start:start + chunk_size], candidates)
+
+        entropy[start:start + chunk_size] = entropy_of(counts, total)
+        worst[start:start + chunk_size] = counts.max(axis=1)
+        expected[start:start + chunk_size] = (counts * counts).sum(axis=1) / total
+
+    return entropy, worst, expected
+
+def score_boards(matrix, boards, guesses, weights=None, block_size=1 << 22):
+    """
+    Score every guess against several candidate sets at once, one per board.
+    Returns the summed entropy and the log2 of the worst joint bucket (the product of the
+    worst bucket of every board) per guess. weights counts boards sharing a candidate set.
+    """
+    patterns = pattern_count(matrix.length)
+    sizes = np.array([len(board) for board in boards])
+    weights = np.ones(len(boards)) if weights is None else np.asarray(weights, dtype=float)
+    candidates = np.concatenate(boards)
+
+    # Every board gets its own range of bins, so all boards are counted in one pass
+    offsets = np.repeat(np.arange(len(boards)) * patterns, sizes)
+    width = len(boards) * patterns
+
+    entropy = np.empty(len(guesses))
+    worst = np.empty(len(guesses))
+
+    chunk_size = max(1, block_size // max(len(candidates), 1))
+    for start in range(0, len(guesses), chunk_size):
+        chunk = guesses[start:start + chunk_size]
+        block = matrix.block(chunk, candidates).astype(np.intp) + offsets
+        block += np.arange(len(chunk))[:, None] * width
+        counts = np.bincount(block.ravel(), minlength=len(chunk) * width).reshape(-1, patterns)
+
+        totals = np.tile(sizes, len(chunk))[:, None]
+        board_entropy = entropy_of(counts, totals).reshape(len(chunk), len(boards))
+        board_worst = np.log2(counts.max(axis=1)).reshape(len(chunk), len(boards))
+
+        entropy[start:start + chunk_size] = board_entropy @ weights
+        worst[start:start + chunk_size] = board_worst @ weights
+
+    return entropy, worst
+
+def reduce_guesses(matrix, candidates, guesses):
+    """
+    Positions in guesses of one guess per class of equivalent guesses.
+    A letter missing from every candidate always comes back absent, so guesses that only
+    differ in such letters give the same pattern for every candidate and the same score.
+    The first guess of each class is kept, so ties resolve as before.
+    """
+    present = np.zeros(26, dtype=bool)
+    present[matrix.codes[candidates].ravel()] = True
+
+    # Absent letters all become 26, one past Z
+    letters = matrix.codes[guesses]
+    footprint = np.where(present[letters], letters, 26)
+    if matrix.length <= 13:
+        footprint = footprint.astype(np.int64) @ (27 ** np.arange(matrix.length, dtype=np.int64))
+    _, first = np.unique(footprint, axis=0, return_index=True)
+
+    return np.sort(first)
+
+def coverage_bound(matrix, candidates, guesses):
+    """
+    Cheap upper bound on the number of feedback patterns of each guess, from the
+    letters at each position of the candidates. No histogram is needed.
+    """
+    remaining = matrix.codes[candidates]
+    letters = matrix.codes[guesses]
+    positions = np.arange(matrix.length)
+
+    # Letters seen at each position, letters shared by every candidate, letters seen anywhere
+    seen = np.zeros((matrix.length, 26), dtype=bool)
+    fixed = np.zeros((matrix.length, 26), dtype=bool)
+    for i in positions:
+        seen[i, remaining[:, i]] = True
+        if (remaining[:, i] == remaining[0, i]).all():
+            fixed[i, remaining[0, i]] = True
+    anywhere = seen.any(axis=0)
+
+    # Colors each letter of the guess can still show
+    green = seen[positions, letters]
+    other = ~fixed[positions, letters]
+    colors = green.astype(np.intp) + (other & anywhere[letters]) + other
+
+    return np.minimum(colors.prod(axis=1), len(candidates))
+
+def search_guess(matrix, candidates, guesses, objective="entropy", chunk_size=128, block_size=512):
+    """
+    Branch and bound search for the guess with the highest entropy ("entropy") or the
+    smallest worst-case bucket ("worst"). Returns the position of the guess in guesses,
+    the same as the argmax/argmin of score_guesses.
+    """
+    total = len(candidates)
+    patterns = coverage_bound(matrix, candidates, guesses)
+
+    # Optimistic score of each guess; try the most promising guesses first
+    if objective == "entropy":
+        bound = np.log2(patterns) + 1e-9     # slack for rounding of the exact entropy
+        order = np.lexsort((np.arange(len(guesses)), -bound))
+    else:
+        bound = -(-total // patterns)       # some bucket holds at least total / patterns words
+        order = np.lexsort((np.arange(len(guesses)), bound))
+
+    best_value, best_index = None, None
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start:start + chunk_size]
+
+        # Guesses whose bound can't reach the best value are never scored
+        if best_value is not None:
+            if objective == "entropy":
+                chunk = chunk[bound[chunk] >= best_value]
+            else:
+                chunk = chunk[bound[chunk] <= best_value]
+            if not len(chunk):
+                break   # the rest are sorted behind this chunk
+
+        if objective == "entropy":
+            values = entropy_of(histograms(matrix, guesses[chunk], candidates), total)
+        else:
+            # Count block by block and drop a guess once a bucket overflows the best worst case
+            counts = np.zeros((len(chunk), pattern_count(matrix.length)), dtype=np.intp)
+            alive = np.arange(len(chunk))
+            for c in range(0, total, block_size):
+                counts[alive] += histograms(matrix, guesses[chunk[alive]], candidates[c:c + block_size])
+                if best_value is not None:
+                    alive = alive[counts[alive].max(axis=1) <= best_value]
+                    if not len(alive):
+                        break
+
+            chunk = chunk[alive]
+            values = -counts[alive].max(axis=1)
+            if not len(chunk):
+                continue
+
+        # Best of the chunk, ties go to the earliest guess like the exhaustive search
+        top = values.max()
+        index = chunk[values == top].min()
+        value = top if objective == "entropy" else -top
+
+        if best_value is None or (value > best_value if objective == "entropy" else value < best_value) \
+                or (value == best_value and index < best_index):
+            best_value, best_index = value, index
+
+    return int(best_index)
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import numpy as np
+from collections import Counter, defaultdict
+
+PERCENTILES = (50, 95, 99)
+
+class Profiler:
+    """
+    Wall time of every solver call, with the number of remaining words and the size of the
+    search range at the time of the call, and the decision tree hits and misses.
+    Methods are wrapped per instance by attach, so a disabled profiler costs nothing.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.records = defaultdict(list)   # call -> [(seconds, turn, candidates, search range)]
+        self.counters = Counter()
+        self.attached = []
+
+    def attach(self, agent, tree=None):
+        # Time the calls of the agent, and of the tree serving its guesses
+        if not self.enabled:
+            return self
+
+        for name in ("make_guess", "filter_words"):
+            self.wrap(agent, name, self.timer(agent, name, getattr(agent, name)))
+        if tree is not None:
+            self.wrap(tree, "get_node", self.tree_timer(agent, tree.get_node))
+        return self
+
+    def detach(self):
+        # Restore the original methods
+        for obj, name in self.attached:
+            del obj.__dict__[name]
+        self.attached = []
+
+    def wrap(self, obj, name, wrapper):
+        obj.__dict__[name] = wrapper
+        self.attached.append((obj, name))
+
+    def sizes(self, agent):
+        # Turn, remaining words and search range of a solver or a multi-board solver
+        if hasattr(agent, "boards"):
+            unsolved = agent.unsolved
+            turn = max(len(board.history) for board in agent.boards)
+            return turn, sum(len(board.ids) for board in unsolved), sum(len(board.search_ids) for board in unsolved)
+        return len(agent.history), len(agent.ids), len(agent.search_ids)
+
+    def timer(self, agent, name, method):
+        records = self.records[name]
+
+        def timed(*args, **kwargs):
+            sizes = self.sizes(agent)
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            records.append((time.perf_counter() - start, *sizes))
+            return result
+        return timed
+
+    def tree_timer(self, agent, get_node):
+        def timed(make_guess, feedback=None):
+            missed = False
+
+            def miss():
+                nonlocal missed
+                missed = True
+                return make_guess()
+
+            sizes = self.sizes(agent)
+            start = time.perf_counter()
+            guess = get_node(miss, feedback)
+            seconds = time.perf_counter() - start
+
+            name = "tree_miss" if missed else "tree_hit"
+            self.records[name].append((seconds, *sizes))
+            self.counters[name] += 1
+            return guess
+        return timed
+
+    def reset(self):
+        self.records.clear()
+        self.counters.clear()
+
+    # --- Report ---
+    def summary(self):
+        # Latency percentiles (ms) and average sizes of every call, and per turn of make_guess
+        def describe(rows):
+            rows = np.array(rows, dtype=float)
+            ms = rows[:, 0] * 1000
+            stats = {'calls': len(rows), 'total_s': round(rows[:, 0].sum(), 4), 'mean_ms': round(ms.mean(), 4)}
+            for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+                stats[f'p{p}_ms'] = round(float(value), 4)
+            stats['max_ms'] = round(ms.max(), 4)
+            stats['candidates'] = round(rows[:, 2].mean(), 1)
+            stats['search_range'] = round(rows[:, 3].mean(), 1)
+            return stats
+
+        calls = {name: describe(rows) for name, rows in sorted(self.records.items()) if rows}
+
+        turns = defaultdict(list)
+        for row in self.records.get("make_guess", []):
+            turns[row[1] + 1].append(row)
+
+        hits, misses = self.counters["tree_hit"], self.counters["tree_miss"]
+        return {
+            'calls': calls,
+            'turns': {turn: describe(rows) for turn, rows in sorted(turns.items())},
+            'tree': {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else None},
+        }
+
+    def table(self, summary=None):
+        # Text tables of the summary
+        summary = summary or self.summary()
+        columns = ['calls', 'total_s', 'mean_ms'] + [f'p{p}_ms' for p in PERCENTILES] + ['max_ms', 'candidates', 'search_range']
+
+        lines = []
+        for title, rows in (("Call", summary['calls']), ("Turn", summary['turns'])):
+            lines.append(f"{title:<14}" + "".join(f"{c:>14}" for c in columns))
+            for name, stats in rows.items():
+                lines.append(f"{name:<14}" + "".join(f"{stats[c]:>14}" for c in columns))
+            lines.append("")
+
+        tree = summary['tree']
+        if tree['hit_rate'] is not None:
+            lines.append(f"Tree: {tree['hits']} hits, {tree['misses']} misses ({tree['hit_rate']:.2%} hit rate)")
+        return "\n".join(lines)
+
+    def report(self, path, **info):
+        # Write the summary of the run, with any extra information such as the solver, as JSON
+        summary = self.summary()
+        summary = {**info, **summary}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
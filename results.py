@@ -0,0 +1,132 @@
+import json
+import time
+import sqlite3
+from collections import defaultdict
+
+class ResultsDB:
+    """
+    Benchmark results stored answer by answer in SQLite, so an interrupted run
+    resumes where it stopped and finished runs can be compared later.
+    """
+    def __init__(self, path='results.db', batch_size=50):
+        # Results are committed in batches of this size
+        self.batch_size = batch_size
+        self.pending = 0
+
+        self.conn = sqlite3.connect(path)
+        self.c = self.conn.cursor()
+
+        # Run names were unique before finished runs could be repeated
+        self.c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'runs'")
+        if (row := self.c.fetchone()) and 'name TEXT UNIQUE' in row[0]:
+            self.c.execute('ALTER TABLE runs RENAME TO runs_old')
+
+        # A run is one solver tested on one word list, resumed under its name until it is finished
+        self.c.execute('''
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            solver TEXT,
+            words_hash TEXT,
+            words INTEGER,
+            started REAL,
+            finished REAL
+        );
+        ''')
+        self.c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'runs_old'")
+        if self.c.fetchone():
+            self.c.execute('INSERT INTO runs SELECT * FROM runs_old')
+            self.c.execute('DROP TABLE runs_old')
+
+        # guesses and times (seconds per turn) are JSON lists
+        self.c.execute('''
+        CREATE TABLE IF NOT EXISTS results (
+            run INTEGER NOT NULL,
+            answer TEXT NOT NULL,
+            attempts INTEGER,
+            guesses TEXT,
+            times TEXT,
+            UNIQUE (run, answer)
+        );
+        ''')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def start(self, agent, name=None):
+        """
+        Id of the run of the agent, resuming the unfinished run of the same name.
+        A finished run is never resumed, a new run of the name is started instead.
+        An unfinished run of another solver or word list is an error, pick another name.
+        """
+        name = name or repr(agent)
+        words_hash = agent.matrix.digest
+
+        self.c.execute('SELECT id, solver, words_hash FROM runs WHERE name = ? AND finished IS NULL ORDER BY id DESC', (name,))
+        if row := self.c.fetchone():
+            run, solver, stored_hash = row
+            if solver != repr(agent) or stored_hash != words_hash:
+                raise ValueError(f"run {name} was stored for {solver} on another word list, use another name")
+            return run
+
+        self.c.execute('INSERT INTO runs (name, solver, words_hash, words, started) VALUES (?, ?, ?, ?, ?)',
+                       (name, repr(agent), words_hash, len(agent.db), time.time()))
+        self.conn.commit()
+        return self.c.lastrowid
+
+    def add(self, run, answer, attempts, guesses, times):
+        # Store the result of one answer, committed once a batch is full
+        self.c.execute('INSERT OR REPLACE INTO results (run, answer, attempts, guesses, times) VALUES (?, ?, ?, ?, ?)',
+                       (run, answer, attempts, json.dumps(guesses), json.dumps([round(t, 6) for t in times])))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def finish(self, run):
+        self.c.execute('UPDATE runs SET finished = ? WHERE id = ?', (time.time(), run))
+        self.flush()
+
+    def done(self, run):
+        # Answers already played in the run
+        self.c.execute('SELECT answer FROM results WHERE run = ?', (run,))
+        return {answer for answer, in self.c.fetchall()}
+
+    def histogram(self, run):
+        # {attempts: number of answers}
+        self.c.execute('SELECT attempts, COUNT(*) FROM results WHERE run = ? GROUP BY attempts', (run,))
+        return defaultdict(int, self.c.fetchall())
+
+    def results(self, run):
+        # (answer, attempts, guesses, times) of every answer of the run
+        self.c.execute('SELECT answer, attempts, guesses, times FROM results WHERE run = ? ORDER BY rowid', (run,))
+        return [(answer, attempts, json.loads(guesses), json.loads(times)) for answer, attempts, guesses, times in self.c.fetchall()]
+
+    def runs(self):
+        # Every stored run with its progress and averages
+        self.c.execute('''
+        SELECT runs.id, name, solver, words, started, finished, COUNT(answer), AVG(attempts)
+        FROM runs LEFT JOIN results ON results.run = runs.id
+        GROUP BY runs.id ORDER BY runs.id
+        ''')
+        columns = ('id', 'name', 'solver', 'words', 'started', 'finished', 'played', 'avg_attempts')
+        return [dict(zip(columns, row)) for row in self.c.fetchall()]
+
+    def turn_times(self, run):
+        # Seconds spent on each turn, by turn number
+        turns = defaultdict(list)
+        for *_, times in self.results(run):
+            for turn, seconds in enumerate(times, start=1):
+                turns[turn].append(seconds)
+        return dict(turns)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
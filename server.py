@@ -0,0 +1,271 @@
+import os
+import json
+import uuid
+import asyncio
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from solvers import *
+from decision_tree import TreeDB
+
+# Line-delimited JSON over TCP, one request per line and one response line per request:
+#   {"id": 1, "op": "new_game", "solver": "Bayesian", "search_all": true, "hard": false}
+#       -> {"id": 1, "session": "...", "solver": "BayesianAll"}
+#   {"id": 2, "op": "next_guess", "session": "..."}
+#       -> {"id": 2, "guess": "SLATE", "source": "tree", "remaining": 2309}
+#   {"id": 3, "op": "submit_feedback", "session": "...", "feedback": [-1, 0, 1, -1, -1]}
+#       -> {"id": 3, "remaining": 12, "solved": false}
+#   {"id": 4, "op": "end_game", "session": "..."}
+#   {"id": 5, "op": "stats"}
+# Failed requests get {"id": ..., "error": "..."}
+# Sessions belong to the connection that created them and end when it closes
+
+SOLVERS = {solver.__name__: solver for solver in (Bayesian, Minimax, Heuristic, Lookahead, Random, Fixed)}
+
+# --- Worker processes ---
+worker_db = None
+worker_agents = {}
+
+def init_worker(db):
+    global worker_db
+    worker_db = db
+
+def get_agent(agents, db, key):
+    # One agent per (solver, search_all, hard), shared by every game of the process
+    if key not in agents:
+        name, search_all, hard = key
+        agents[key] = SOLVERS[name](db, search_all, hard=hard)
+    return agents[key]
+
+def solve_batch(key, states):
+    # Next guess of each game state, states with the same candidate set are solved once
+    return get_agent(worker_agents, worker_db, key).make_guesses(states)
+
+
+class Session:
+    """One game: its solver, its state and its position in the decision tree"""
+    def __init__(self, key, state, cursor):
+        self.key = key
+        self.state = state
+        self.cursor = cursor
+        self.guess = None       # last guess, waiting for its feedback
+        self.feedback = None    # feedback of the guess before, None at the start of the game
+        self.solved = False
+        self.lock = asyncio.Lock()
+
+
+class SolverServer:
+    """
+    Serves any number of isolated games. Guesses found in the decision tree are answered
+    inline, misses are solved in a process pool. Misses arriving within batch_delay are
+    sent as one batch per solver, and games sharing a candidate set wait for the same guess.
+    """
+    def __init__(self, db, workers=os.cpu_count(), use_tree=True, batch_delay=0.002):
+        self.db = db
+        self.workers = workers
+        self.use_tree = use_tree
+        self.batch_delay = batch_delay
+        # Spawned, not forked: forked workers would keep the sockets of open connections alive
+        self.pool = ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"), init_worker, (db,))
+
+        # The agents of the server filter the game states; they never compute guesses
+        self.agents = {}
+        self.trees = {}
+        self.sessions = {}
+
+        self.pending = {}   # solver key -> [(fingerprint, state)] of the next batch
+        self.running = {}   # (solver key, fingerprint) -> future of the guess
+        self.stats = Counter()
+
+    def agent(self, key):
+        return get_agent(self.agents, self.db, key)
+
+    def tree(self, key):
+        # Decision tree of the solver, None when disabled or for Random
+        if not self.use_tree or key[0] == "Random":
+            return None
+        if key not in self.trees:
+            agent = self.agent(key)
+            self.trees[key] = TreeDB(repr(agent), words_hash=agent.matrix.digest)
+        return self.trees[key]
+
+    async def handle(self, reader, writer):
+        # Requests of a connection are answered in order
+        sessions = set()    # sessions created by the connection
+        try:
+            while line := await reader.readline():
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = await self.dispatch(request)
+                    if request.get('op') == "new_game":
+                        sessions.add(response['session'])
+                except Exception as e:
+                    request = request if isinstance(request, dict) else {}
+                    response = {'error': f"{type(e).__name__}: {e}"}
+                    self.stats['errors'] += 1
+
+                writer.write(json.dumps({'id': request.get('id'), **response}).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Clients that disconnect or crash without end_game don't leave their games behind
+            for session_id in sessions:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def dispatch(self, request):
+        op = request.get('op')
+        method = getattr(self, f"op_{op}", None)
+        if method is None:
+            raise ValueError(f"unknown op {op!r}")
+
+        self.stats[op] += 1
+        return await method(request)
+
+    def session(self, request):
+        try:
+            return self.sessions[request['session']]
+        except KeyError:
+            raise KeyError(f"unknown session {request.get('session')!r}") from None
+
+    # --- Operations ---
+    async def op_new_game(self, request):
+        name = request.get('solver', "Bayesian")
+        if name not in SOLVERS:
+            raise ValueError(f"unknown solver {name!r}, expected one of {', '.join(SOLVERS)}")
+        key = (name, bool(request.get('search_all', True)), bool(request.get('hard', False)))
+
+        agent = self.agent(key)
+        agent.reset()
+        tree = self.tree(key)
+
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = Session(key, agent.get_state(), tree.root() if tree else None)
+        return {'session': session_id, 'solver': repr(agent)}
+
+    async def op_next_guess(self, request):
+        session = self.session(request)
+        async with session.lock:
+            if session.solved:
+                raise ValueError("the game is solved")
+            if session.guess is None:
+                session.guess, source = await self.next_guess(session)
+            else:
+                source = "repeat"   # the last guess is still waiting for its feedback
+
+        return {'guess': session.guess, 'source': source, 'remaining': len(session.state[0])}
+
+    async def op_submit_feedback(self, request):
+        session = self.session(request)
+        feedback = [int(f) for f in request['feedback']]
+
+        async with session.lock:
+            if session.guess is None:
+                raise ValueError("no guess to give feedback on, ask for next_guess first")
+            if len(feedback) != len(session.guess) or any(f not in (-1, 0, 1) for f in feedback):
+                raise ValueError(f"feedback must be {len(session.guess)} values of -1, 0 or 1")
+
+            if all(f == 1 for f in feedback):
+                session.solved = True
+            else:
+                session.state = self.agent(session.key).filter_state(session.state, session.guess, feedback)
+                session.feedback = feedback
+            session.guess = None
+
+        return {'remaining': len(session.state[0]), 'solved': session.solved}
+
+    async def op_end_game(self, request):
+        self.sessions.pop(request['session'], None)
+        return {}
+
+    async def op_stats(self, request):
+        return {'sessions': len(self.sessions), **self.stats}
+
+    # --- Guesses ---
+    async def next_guess(self, session):
+        # Guess from the decision tree, or from the solver on a miss
+        if session.cursor is not None:
+            try:
+                guess, session.cursor = session.cursor.advance(session.feedback)
+                self.stats['tree_hits'] += 1
+                return guess, "tree"
+            except KeyError:
+                self.stats['tree_misses'] += 1
+
+        guess = await self.solve(session.key, session.state)
+        if session.cursor is not None and guess is not None:
+            # Learn the miss, another game may have added the node in the meantime
+            guess, session.cursor = session.cursor.advance(session.feedback, lambda: guess)
+        return guess, "solver"
+
+    async def solve(self, key, state):
+        agent = self.agent(key)
+        agent.set_state(state)
+        fingerprint = agent.fingerprint()
+
+        # Games with the same candidate set wait for the same guess
+        if (key, fingerprint) not in self.running:
+            self.running[key, fingerprint] = asyncio.get_running_loop().create_future()
+            batch = self.pending.setdefault(key, [])
+            batch.append((fingerprint, state))
+            if len(batch) == 1:
+                asyncio.get_running_loop().call_later(self.batch_delay, self.flush, key)
+        else:
+            self.stats['shared_misses'] += 1
+
+        return await asyncio.shield(self.running[key, fingerprint])
+
+    def flush(self, key):
+        # Split the batch of the solver across the workers
+        batch = self.pending.pop(key, [])
+        size = -(-len(batch) // self.workers)
+        for start in range(0, len(batch), size):
+            asyncio.ensure_future(self.run_batch(key, batch[start:start + size]))
+        self.stats['batches'] += 1
+
+    async def run_batch(self, key, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            guesses = await loop.run_in_executor(self.pool, solve_batch, key, [state for _, state in batch])
+        except Exception as e:
+            guesses = [e] * len(batch)
+
+        for (fingerprint, _), guess in zip(batch, guesses):
+            future = self.running.pop((key, fingerprint))
+            if isinstance(guess, Exception):
+                future.set_exception(guess)
+            else:
+                future.set_result(guess)
+
+    def close(self):
+        # Write the pending nodes of the decision trees and stop the workers
+        for tree in self.trees.values():
+            tree.close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+async def serve(server, host, port):
+    async with await asyncio.start_server(server.handle, host, port) as listener:
+        print(f"Serving on {host}:{port}")
+        try:
+            await listener.serve_forever()
+        finally:
+            server.close()
+
+
+if __name__ == "__main__":
+    host = "127.0.0.1"
+    port = 8765
+
+    # Worker processes solving the tree misses
+    workers = os.cpu_count()
+
+    # Answer from tree.db when possible and store the solved misses in it
+    use_tree = True
+
+    try:
+        asyncio.run(serve(SolverServer(load_words(), workers, use_tree), host, port))
+    except KeyboardInterrupt:
+        pass
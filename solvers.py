@@ -1,10 +1,18 @@
+import os
+import json
 import random
+import hashlib
 from math import log2
-from collections import defaultdict, Counter
+import numpy as np
+from collections import defaultdict, deque, Counter, OrderedDict
+from collections.abc import Sequence
+from patterns import decode_feedback, encode_feedback, get_matrix, pattern_count, reduce_guesses, score_boards, score_guesses, search_guess
+from word_store import WordStore
+from bitmasks import LetterMasks
 
 def load_words(path="words.txt"):
-    with open(path, 'r') as f:
-        return f.read().splitlines()
+    # Encoded and validated word list, raises ValueError on a malformed file
+    return WordStore.load(path)
 
 def get_feedback(guess, word):
     """Generate feedback for the guess"""
@@ -28,30 +36,207 @@ def get_feedback(guess, word):
 
 
 # --- Handler ---
+class WordView(Sequence):
+    """Read only view of the words at the given indices of the database"""
+    def __init__(self, db, ids):
+        self.db = db
+        self.ids = ids
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.db[j] for j in self.ids[i]]
+        return self.db[self.ids[i]]
+    
+    def __iter__(self):
+        return (self.db[i] for i in self.ids)
+    
+    def __repr__(self):
+        return repr(list(self))
+
+class GuessCache:
+    """
+    Bounded LRU cache of guesses. Entries are loaded from path if it exists,
+    and written back only by save(), e.g. at the end of a run.
+    """
+    def __init__(self, max_size=4096, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries.update(json.load(f))
+            # Keep the most recent entries of a file saved with a larger cache
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __repr__(self):
+        return f"{self.__class__.__name__}(size={len(self)}, hits={self.hits}, misses={self.misses})"
+    
+    def get(self, key):
+        guess = self.entries.get(key)
+        if guess is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return guess
+    
+    def put(self, key, guess):
+        self.entries[key] = guess
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)    # least recently used
+    
+    def save(self, path=None):
+        # Write the entries as JSON, atomically replacing the previous file
+        path = path or self.path
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, path)
+
 class Handler:
     """Basic algorithm to start the game and filter the words based on the feedback"""
-    def __init__(self, db, search_all=True):
-        self.db = db    # read only words database
-        self.words = db.copy()
+    def __init__(self, db, search_all=True, cache_size=4096, cache_path=None, guesses=None, hard=False, backend="matrix"):
+        # Shared feedback patterns of the database. An allowed guesses list can be larger than
+        # the database of answers, by default every answer and only the answers are allowed
+        self.matrix = get_matrix(db, guesses=guesses)
+        self.db = self.matrix.words     # read only WordStore of the answers
+        self.guesses = self.matrix.guesses  # allowed guesses, the answers come first
+
+        # Guesses already computed for a candidate set, 0 disables the cache
+        self.cache = GuessCache(cache_size, cache_path) if cache_size else None
+
+        # The remaining words are tracked as indices into the database
+        self.all_ids = np.arange(len(self.db))
+        self.guess_ids = np.arange(len(self.guesses))
+        self.ids = self.all_ids
+        self.history = []   # (guess, feedback) of the current game
+        # (search range, guesses scored) of the last computed turns. Bounded, as agents serving
+        # many games through set_state never reset
+        self.reductions = deque(maxlen=64)
+
+        # Hard mode: every revealed hint must be used in later guesses. The allowed guesses
+        # are narrowed down turn by turn like the remaining words
+        self.hard = hard
+        self.hard_ids = self.guess_ids
+
+        # Filtering backend, both keep the same words: "matrix" compares the precomputed patterns,
+        # "bitmask" intersects letter masks of the answers and needs no matrix row for the guess
+        if backend not in ("matrix", "bitmask"):
+            raise ValueError(f"unknown backend {backend!r}, expected 'matrix' or 'bitmask'")
+        self.backend = backend
+        self.masks = LetterMasks(self.db) if backend == "bitmask" else None
 
         # Set up the search range
-        if search_all:
-            self.search_all = "All"
-            self.search_range = db
-        else:
-            self.search_all = "Filtered"
-            self.search_range = self.words
+        self.search_all = "All" if search_all else "Filtered"
     
     def __repr__(self):
-        return self.__class__.__name__ + self.search_all
+        return self.__class__.__name__ + self.search_all + self.variant()
+    
+    def options(self):
+        # Keyword arguments building an agent with the same settings, e.g. in a worker process
+        return {
+            'cache_size': self.cache.max_size if self.cache is not None else 0,
+            'cache_path': self.cache.path if self.cache is not None else None,
+            'guesses': self.guesses if self.guesses is not self.db else None,
+            'hard': self.hard,
+            'backend': self.backend,
+        }
+    
+    def variant(self):
+        # Suffix telling apart hard mode and larger allowed guesses lists, e.g. in tree.db
+        suffix = f"-g{len(self.guesses)}" if self.guesses is not self.db else ""
+        return suffix + ("-hard" if self.hard else "")
+    
+    @property
+    def words(self):
+        return WordView(self.db, self.ids)
+    
+    @property
+    def search_ids(self):
+        # The remaining words satisfy every hint, so hard mode only narrows down "All"
+        if self.search_all == "All":
+            return self.hard_ids if self.hard else self.guess_ids
+        return self.ids
+    
+    @property
+    def search_range(self):
+        if self.search_all == "All":
+            return WordView(self.guesses, self.search_ids)
+        return self.words
     
     def reset(self):
         # Reset the word list after each game
-        self.words[:] = self.db.copy()
+        self.ids = self.all_ids
+        self.hard_ids = self.guess_ids
+        self.history = []
+        self.reductions.clear()
+    
+    def get_state(self):
+        # Independent copy of the current game: remaining word indices, history and hard mode guesses
+        return self.ids, tuple(self.history), self.hard_ids
+    
+    def set_state(self, state):
+        # Continue the game from a state returned by get_state
+        self.ids, history, self.hard_ids = state
+        self.history = list(history)
+    
+    def filter_state(self, state, guess, feedback):
+        # The state after the feedback, leaving the current game untouched
+        current = self.get_state()
+        self.set_state(state)
+        self.filter_words(guess, feedback)
+        state = self.get_state()
+        self.set_state(current)
+        return state
+    
+    def fingerprint(self, *extra):
+        # Hash of everything the next guess depends on
+        data = self.ids.tobytes() + b"".join(extra)
+        if self.hard and self.search_all == "All":
+            data += b"|" + self.hard_ids.tobytes()
+        return hashlib.blake2b(data, digest_size=16).digest()
+    
+    def narrow_hard(self, ids, guess, feedback):
+        # Allowed guesses among ids that keep the greens in place and reuse the yellows
+        codes, counts = self.guesses.codes, self.guesses.counts
+        required = Counter()
+        for i, (f, g) in enumerate(zip(feedback, guess)):
+            if f == 1:
+                ids = ids[codes[ids, i] == ord(g) - ord('A')]
+            if f != -1:
+                required[g] += 1
+        for letter, n in required.items():
+            ids = ids[counts[ids, ord(letter) - ord('A')] >= n]
+        return ids
     
     def filter_words(self, guess, feedback):
         # Filter the word based on the feedback
-        self.words[:] = [word for word in self.words if self.match_feedback(guess, word, feedback)]
+        self.history.append((guess, list(feedback)))
+        if self.hard:
+            self.hard_ids = self.narrow_hard(self.hard_ids, guess, feedback)
+
+        if self.masks is not None:
+            self.ids = self.masks.filter(self.ids, guess, feedback)
+            return
+
+        if guess not in self.matrix.index:
+            keep = [self.match_feedback(guess, self.db[i], feedback) for i in self.ids]
+            self.ids = self.ids[np.array(keep, dtype=bool)]
+            return
+
+        # Compare the precomputed patterns of the remaining words with the feedback at once
+        patterns = self.matrix.patterns(self.matrix.index[guess], self.ids)
+        self.ids = self.ids[patterns == encode_feedback(feedback)]
     
     def match_feedback(self, guess, word, feedback):
         # A faster version with early exist strategy of get_feedback(guess, word) == feedback
@@ -60,6 +245,8 @@ class Handler:
             if f == 1:
                 if g != w:
                     return False    # Exact match expected but not found
+            elif g == w:
+                return False        # Unexpected exact match
             else:
                 counts[w] += 1
         
@@ -75,6 +262,19 @@ class Handler:
         
         return True
     
+    def reduced_search_ids(self):
+        # One guess of every class of equivalent guesses in the search range
+        if self.search_all != "All":
+            return self.ids     # every guess is a candidate, nothing collapses
+
+        ids = self.search_ids[reduce_guesses(self.matrix, self.ids, self.search_ids)]
+        self.reductions.append((len(self.search_ids), len(ids)))
+        return ids
+    
+    def score(self):
+        # Entropy, worst-case bucket and expected remaining size of every guess in the search range
+        return score_guesses(self.matrix, self.ids, self.search_ids)
+    
     def make_guess(self):
         len_words = len(self.words)
         if len_words == 0:
@@ -82,102 +282,194 @@ class Handler:
         elif len_words <= 2:
             return self.words[0]
         
-        # Construct guess
-        return self.construct_guess()
+        if self.cache is None:
+            return self.construct_guess()
 
+        # Any path reaching the same candidate set shares the guess
+        key = f"{self}:{self.matrix.digest[:16]}:{self.fingerprint().hex()}"
+        if (guess := self.cache.get(key)) is None:
+            guess = self.construct_guess()
+            self.cache.put(key, guess)
 
-# --- Solvers ---
-class Bayesian(Handler):
-    """Apply Bayesian search to find the word with highest entropy in the word list"""
-    def construct_guess(self):
-        # Bayesian selection using precomputed entropy values
-        return max(self.search_range, key=self.compute_information_gain)
+        return guess
     
-    def compute_information_gain(self, guess):
-        feedback_distribution = defaultdict(int)
+    def make_guesses(self, states):
+        """
+        Next guess for each of many independent game states.
+        Games with the same candidate set share one computation.
+        """
+        current = self.get_state()
+        guesses = {}
 
-        for word in self.words:
-            feedback = tuple(get_feedback(guess, word))
-            feedback_distribution[feedback] += 1
+        result = []
+        for state in states:
+            self.set_state(state)
+            key = self.fingerprint()
+            if key not in guesses:
+                guesses[key] = self.make_guess()
+            result.append(guesses[key])
 
-        # Compute entropy for the guess
-        total_words = len(self.words)
-        entropy = -sum((count / total_words) * log2(count / total_words)
-                    for count in feedback_distribution.values() if count > 0)  # Avoid log2(0)
+        self.set_state(current)
+        return result
 
-        return entropy
+
+# --- Solvers ---
+class Bayesian(Handler):
+    """Apply Bayesian search to find the word with highest entropy in the word list"""
+    def construct_guess(self):
+        # Bayesian selection by branch and bound on the entropy, same result as the argmax of self.score()
+        guesses = self.reduced_search_ids()
+        return self.guesses[guesses[search_guess(self.matrix, self.ids, guesses, "entropy")]]
 
 class Minimax(Handler):
     """Maximize the minimum gain"""
     def construct_guess(self):
-        # Run minimax to find the best guess
-        best_guess = None
-        min_worst_case = float('inf')
-        
-        # Simulate all possible feedback scenarios for this guess
-        for guess in self.search_range:
-            feedback_groups = defaultdict(list)
-            for word in self.words:
-                feedback = tuple(get_feedback(guess, word))
-                feedback_groups[feedback].append(word)
-            
-            # Calculate the worst-case scenario for this guess
-            worst_case = max(len(group) for group in feedback_groups.values())
-            
-            # Select the guess with the best worst-case outcome
-            if worst_case < min_worst_case:
-                min_worst_case = worst_case
-                best_guess = guess
-        
-        return best_guess
+        # Select the guess with the best worst-case outcome over all feedback scenarios,
+        # skipping guesses as soon as one of their buckets is worse than the best so far
+        guesses = self.reduced_search_ids()
+        return self.guesses[guesses[search_guess(self.matrix, self.ids, guesses, "worst")]]
 
 class Heuristic(Handler):
     """Letter Frequency Heuristic Solver"""
-    def __init__(self, db, search_all):
-        super().__init__(db, search_all)
+    def __init__(self, db, search_all, **kwargs):
+        super().__init__(db, search_all, **kwargs)
 
-        self.length = len(db[0])    # word length
+        self.length = self.db.length    # word length
         # Track the feedback of the green position
         self.green_pos = [0] * self.length
+
+        # Letter of every word at every position (0 for A) and the 26 x length letter counts
+        # of the remaining words, kept up to date as words are filtered out
+        self.letters = self.matrix.codes    # letter codes of the allowed guesses, 0 for A
+        self.full_counts = self.count_letters(self.all_ids)
+        self.counts = self.full_counts.copy()
+        self.frequencies = np.zeros_like(self.counts)
     
     def reset(self):
         super().reset()
         self.green_pos = [0] * self.length
+        self.counts = self.full_counts.copy()
+    
+    def set_state(self, state):
+        super().set_state(state)
+        self.green_pos = [0] * self.length
+        for guess, feedback in self.history:
+            self.update_green(guess, feedback)
+        self.counts = self.count_letters(self.ids)
+    
+    def fingerprint(self):
+        return super().fingerprint(bytes(1 if g else 0 for g in self.green_pos))
+    
+    def count_letters(self, ids):
+        counts = np.zeros((26, self.length), dtype=np.intp)
+        for i in range(self.length):
+            counts[:, i] = np.bincount(self.letters[ids, i], minlength=26)
+        return counts
     
     def filter_words(self, guess, feedback):
+        before = self.ids
         super().filter_words(guess, feedback)
+        self.update_green(guess, feedback)
+
+        # Subtract the removed words, or count the remaining ones if there are fewer
+        if len(self.ids) < len(before) - len(self.ids):
+            self.counts = self.count_letters(self.ids)
+        else:
+            self.counts -= self.count_letters(np.setdiff1d(before, self.ids, assume_unique=True))
+    
+    def update_green(self, guess, feedback):
         self.green_pos = [guess[i] if feedback[i] == 1 else self.green_pos[i] for i in range(self.length)]
 
     def construct_guess(self):
-        position_letter_frequencies = [None] * self.length
-        self.overall_letter_frequencies = Counter()
+        # If only one letter remains at a position, mark it as green
+        single = (self.counts > 0).sum(axis=0) == 1
+        self.green_pos = [1 if single[i] and not g else g for i, g in enumerate(self.green_pos)]
 
-        for i in range(self.length):
-            if self.green_pos[i]:
-                continue    # skip green positions to reduce computation
+        # Frequency of each letter at each non-green position
+        self.frequencies = self.counts.copy()
+        self.frequencies[:, [bool(g) for g in self.green_pos]] = 0
 
-            letter_counts = Counter(word[i] for word in self.words)
-                
-            if len(letter_counts) == 1:    # If only one letter remains, mark it as green
-                self.green_pos[i] = 1
-                continue
-            
-            position_letter_frequencies[i] = letter_counts
-            self.overall_letter_frequencies.update(letter_counts)
-        
-        return max(self.search_range, key=lambda guess: self.compute_frequency(guess, position_letter_frequencies))
-        
-    def compute_frequency(self, guess, position_letter_frequencies):
-        # Compute the frequency of each non-green letter in the word
-        frequency = 0
-        for i in range(self.length):
-            if not self.green_pos[i]:
-                frequency += position_letter_frequencies[i][guess[i]]
-        
-        return frequency
+        # Score every guess at once: sum the frequencies of its letters at their positions
+        guesses = self.reduced_search_ids()
+        scores = self.frequencies[self.letters[guesses], np.arange(self.length)].sum(axis=1)
+
+        return self.guesses[guesses[scores.argmax()]]
         
     def get_counts(self):
-        return self.overall_letter_frequencies 
+        # Overall frequency of each letter at the non-green positions of the last guess
+        return Counter({chr(ord('A') + i): int(n) for i, n in enumerate(self.frequencies.sum(axis=1)) if n})
+
+class Lookahead(Handler):
+    """Search k guesses ahead for the guess with the fewest expected attempts"""
+    # Bits of information a good guess reveals, used to estimate attempts beyond the search depth
+    BITS_PER_GUESS = 4.4
+
+    def __init__(self, db, search_all, depth=2, top=10, memo_size=1 << 17, **kwargs):
+        super().__init__(db, search_all, **kwargs)
+        self.depth = depth  # guesses to search ahead
+        self.top = top      # guesses with the highest entropy tried at each level
+
+        # Hash of (candidate set, depth, allowed guesses) -> (expected attempts, guess index),
+        # shared by all games and bounded for long-lived agents
+        self.memo = GuessCache(memo_size)
+    
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.search_all}-d{self.depth}n{self.top}{self.variant()}"
+    
+    def options(self):
+        return {**super().options(), 'depth': self.depth, 'top': self.top, 'memo_size': self.memo.max_size}
+    
+    def construct_guess(self):
+        return self.guesses[self.solve(self.ids, self.depth, self.hard_ids)[1]]
+    
+    def estimate(self, size):
+        # Expected attempts for a candidate set that is not searched
+        if size == 1:
+            return 1
+        return 1 + (size - 1) / size * max(1, log2(size) / self.BITS_PER_GUESS)
+    
+    def solve(self, ids, depth, allowed):
+        # Expected attempts to finish from the candidate set and the guess achieving it.
+        # allowed holds the guesses of "All" mode, narrowed down along the branch in hard mode
+        if len(ids) <= 2:
+            return (1, 1.5)[len(ids) - 1], ids[0]
+        
+        hard = self.hard and self.search_all == "All"
+        data = ids.tobytes() + b"|%d|" % depth + (allowed.tobytes() if hard else b"")
+        key = hashlib.blake2b(data, digest_size=16).digest()
+        if (best := self.memo.get(key)) is not None:
+            return best
+
+        # Only the guesses with the highest entropy are searched
+        guesses = allowed if self.search_all == "All" else ids
+        entropy, _, _ = score_guesses(self.matrix, ids, guesses)
+        top = guesses[np.argsort(-entropy, kind='stable')[:self.top]]
+
+        solved = pattern_count(self.matrix.length) - 1
+        best = (float('inf'), None)
+        for guess in top:
+            patterns = self.matrix.patterns(guess, ids)
+
+            # One attempt for this guess, plus the expected attempts of every other outcome
+            expected = 1
+            for code in np.unique(patterns):
+                if code == solved:
+                    continue
+                remaining = ids[patterns == code]
+                if depth > 1:
+                    branch = allowed
+                    if hard:
+                        branch = self.narrow_hard(allowed, self.guesses[guess], decode_feedback(code, self.matrix.length))
+                    attempts = self.solve(remaining, depth - 1, branch)[0]
+                else:
+                    attempts = self.estimate(len(remaining))
+                expected += len(remaining) / len(ids) * attempts
+
+            if expected < best[0]:
+                best = (expected, guess)
+
+        self.memo.put(key, best)
+        return best
 
 class Random(Handler):
     """Randonly select a word from the word list"""
@@ -196,6 +488,93 @@ class Fixed(Handler):
         return self.words[len(self.words) // pos]
 
 
+
+# --- Multi-board ---
+class MultiBoard:
+    """
+    Play several boards at once (4 for Quordle, 8 for Octordle): every guess goes to all boards.
+    Each board keeps its own candidate set; the guess maximizes the summed entropy of the
+    unsolved boards ("entropy") or minimizes the worst joint outcome ("worst").
+    """
+    def __init__(self, db, boards=4, objective="entropy", search_all=True, cache_size=4096, guesses=None):
+        self.objective = objective
+        self.boards = [Handler(db, search_all, cache_size=0, guesses=guesses) for _ in range(boards)]
+
+        main = self.boards[0]
+        self.db, self.guesses, self.matrix = main.db, main.guesses, main.matrix
+        self.search_all = main.search_all
+        self.cache = GuessCache(cache_size) if cache_size else None
+
+        self.solved = [False] * boards
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{len(self.boards)}-{self.objective}{self.search_all}{self.boards[0].variant()}"
+
+    @property
+    def unsolved(self):
+        return [board for board, solved in zip(self.boards, self.solved) if not solved]
+
+    def reset(self):
+        for board in self.boards:
+            board.reset()
+        self.solved = [False] * len(self.boards)
+
+    def fingerprint(self):
+        # Hash of the candidate sets of the unsolved boards, in board order
+        digest = hashlib.blake2b(digest_size=16)
+        for board, solved in zip(self.boards, self.solved):
+            digest.update(b"-" if solved else board.ids.tobytes() + b"|")
+        return digest.digest()
+
+    def filter_words(self, guess, feedbacks):
+        # One feedback per board, ignored for the boards already solved
+        solved = pattern_count(self.matrix.length) - 1
+        for i, (board, feedback) in enumerate(zip(self.boards, feedbacks)):
+            if self.solved[i]:
+                continue
+            if encode_feedback(feedback) == solved:
+                self.solved[i] = True
+            else:
+                board.filter_words(guess, feedback)
+
+    def make_guess(self):
+        unsolved = self.unsolved
+        if not unsolved or any(len(board.ids) == 0 for board in unsolved):
+            return
+
+        # A board down to one word is solved for free while the others learn from the guess
+        for board in unsolved:
+            if len(board.ids) == 1:
+                return board.words[0]
+
+        if self.cache is None:
+            return self.construct_guess()
+
+        key = f"{self}:{self.matrix.digest[:16]}:{self.fingerprint().hex()}"
+        if (guess := self.cache.get(key)) is None:
+            guess = self.construct_guess()
+            self.cache.put(key, guess)
+        return guess
+
+    def construct_guess(self):
+        # Boards with the same candidate set (all of them on the first turn) are scored once
+        sets = {}
+        for board in self.unsolved:
+            sets.setdefault(board.ids.tobytes(), [board.ids, 0])[1] += 1
+        boards, weights = zip(*sets.values())
+
+        candidates = np.unique(np.concatenate(boards))
+        guesses = self.boards[0].guess_ids if self.search_all == "All" else candidates
+        guesses = guesses[reduce_guesses(self.matrix, candidates, guesses)]
+
+        entropy, worst = score_boards(self.matrix, boards, guesses, weights)
+        if self.objective == "entropy":
+            best = entropy.argmax()
+        else:
+            best = np.lexsort((-entropy, worst))[0]     # ties go to the higher entropy
+        return self.guesses[guesses[best]]
+
+
 if __name__ == "__main__":
     # Bayesian, Minimax, Heuristic, Random, Fixed
     Solver = Bayesian
@@ -217,6 +596,10 @@ if __name__ == "__main__":
             guess = agent.make_guess()
             print(f"Attempt {attempt}: {guess}")
 
+            if agent.reductions:
+                before, after = agent.reductions[-1]
+                print(f"Search range: {before} -> {after} guesses")
+
             if guess == answer:
                 break
             
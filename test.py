@@ -1,16 +1,66 @@
+import os
+import time
+import random
 from collections import defaultdict
+from multiprocessing import Pool
 from tqdm import tqdm
 from solvers import *
-from decision_tree import TreeDB
+from decision_tree import TreeDB, TreeSnapshot
+from profiling import Profiler
+from results import ResultsDB
 
-def test_solver(agent, tree):
+def play_game(agent, answer, make_guess, turns=None):
+    """
+    Play one game against the answer and return the number of attempts.
+    The (guess, seconds) of every turn are appended to turns if given.
+    """
+    attempt = 1
+
+    feedback = None
+    while True:
+        # Make a guess and get feedback
+        start = time.perf_counter()
+        guess = make_guess(agent.make_guess, feedback)
+        if turns is not None:
+            turns.append((guess, time.perf_counter() - start))
+        
+        if guess == answer:
+            break
+        
+        feedback = get_feedback(guess, answer)
+        agent.filter_words(guess, feedback)
+
+        attempt += 1
+
+    agent.reset()
+    return attempt
+
+def resume(agent, results, name):
+    # Run id, histogram of the answers already played and the answers left
+    if results is None:
+        return None, defaultdict(int), list(agent.db)
+
+    run = results.start(agent, name)
+    done = results.done(run)
+    return run, results.histogram(run), [answer for answer in agent.db if answer not in done]
+
+def store(results, run, answer, attempt, turns):
+    if results is not None:
+        results.add(run, answer, attempt, [guess for guess, _ in turns], [seconds for _, seconds in turns])
+
+def test_solver(agent, tree, results=None, name=None):
     """
     Test all solvers by looping through a subset of words from the database.
     Measures the average number of attempts needed to guess the correct word.
+    With a ResultsDB every answer is stored as it is played, and the answers
+    of an interrupted run of the same name are skipped. Once a run is finished,
+    testing again starts a new run.
     """
-    progress_bar = tqdm(agent.db, desc=f"Testing {agent}")
-    result = defaultdict(int)
-    avg_attempt = 0
+    run, result, answers = resume(agent, results, name)
+    played = sum(result.values())
+    avg_attempt = sum(attempt * n for attempt, n in result.items())
+
+    progress_bar = tqdm(answers, desc=f"Testing {agent}", initial=played, total=len(agent.db))
 
     if agent.__repr__() != "RandomSolver":
         make_guess = tree.get_node
@@ -18,37 +68,122 @@ def test_solver(agent, tree):
         # RandomSolver doesn't use the decision tree
         make_guess = agent.make_guess
 
-    for i, answer in enumerate(progress_bar, start=1):
-        attempt = 1
-
-        feedback = None
-        while True:
-            # Make a guess and get feedback
-            guess = make_guess(agent.make_guess, feedback)
-            
-            if guess == answer:
-                break
-            
-            feedback = get_feedback(guess, answer)
-            agent.filter_words(guess, feedback)
-
-            attempt += 1
+    for answer in progress_bar:
+        turns = []
+        attempt = play_game(agent, answer, make_guess, turns)
         
         # Store the result in the database
+        store(results, run, answer, attempt, turns)
         result[attempt] += 1
         avg_attempt += attempt
+        played += 1
+
+        progress_bar.set_postfix(avg=f"{avg_attempt / played:.4f}")
+    
+    if results is not None:
+        results.finish(run)
+    tree.close()
+    return result
+
 
-        agent.reset()
+# --- Multi-board ---
+def play_boards(agent, answers):
+    """Play one multi-board game and return the number of attempts to solve every board"""
+    attempt = 0
+    while not all(agent.solved):
+        guess = agent.make_guess()
+        agent.filter_words(guess, [get_feedback(guess, answer) for answer in answers])
+        attempt += 1
+
+    agent.reset()
+    return attempt
+
+def test_boards(agent, games=500, seed=0):
+    """
+    Play answer tuples sampled from the database with a fixed seed, one tuple per game,
+    so every multi-board solver plays the same games.
+    """
+    rng = random.Random(seed)
+    games = [rng.sample(agent.db, len(agent.boards)) for _ in range(games)]
+
+    progress_bar = tqdm(games, desc=f"Testing {agent}")
+    result = defaultdict(int)
+    avg_attempt = 0
+
+    for i, answers in enumerate(progress_bar, start=1):
+        attempt = play_boards(agent, answers)
+
+        result[attempt] += 1
+        avg_attempt += attempt
 
         progress_bar.set_postfix(avg=f"{avg_attempt / i:.4f}")
+
+    return result
+
+
+# --- Parallel ---
+worker_agent = None
+worker_tree = None
+worker_name = None
+
+def init_worker(solver, db, search_all, options, tree_path, name):
+    # Every worker process plays with its own solver instance and its own copy of the tree
+    global worker_agent, worker_tree, worker_name
+    worker_agent = solver(db, search_all, **options)
+    worker_name = name
+    if tree_path:
+        worker_tree = TreeSnapshot(repr(worker_agent), tree_path, fallback=True, words_hash=worker_agent.matrix.digest)
+
+def play_chunk(answers):
+    # Checked here rather than in init_worker, where an error would make the pool respawn workers forever
+    if repr(worker_agent) != worker_name:
+        raise ValueError(f"worker built {worker_agent!r} instead of {worker_name}, see Handler.options")
+
+    make_guess = worker_tree.get_node if worker_tree else lambda make_guess, _: make_guess()
+    games = []
+    for answer in answers:
+        turns = []
+        attempt = play_game(worker_agent, answer, make_guess, turns)
+        games.append((answer, attempt, turns))
+    return games
+
+def test_solver_parallel(agent, workers=os.cpu_count(), chunk_size=16, results=None, name=None, tree_path='tree.db'):
+    """
+    Same as test_solver, but splits the answers across worker processes.
+    Workers play through a snapshot of the agent's tree in tree_path, asking the solver on
+    misses without storing them, so the merged histogram is identical to a serial run on
+    the same tree. With tree_path None the solver plays every turn, which matches a serial
+    run only where the tree holds the guesses of the current solver.
+    """
+    run, result, answers = resume(agent, results, name)
+    played = sum(result.values())
+    avg_attempt = sum(attempt * n for attempt, n in result.items())
+
+    progress_bar = tqdm(total=len(agent.db), initial=played, desc=f"Testing {agent} ({workers} workers)")
+
+    chunks = [answers[i:i + chunk_size] for i in range(0, len(answers), chunk_size)]
+    initargs = (type(agent), agent.db, agent.search_all == "All", agent.options(), tree_path, repr(agent))
+
+    with Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        for games in pool.imap_unordered(play_chunk, chunks):
+            for answer, attempt, turns in games:
+                store(results, run, answer, attempt, turns)
+                result[attempt] += 1
+                avg_attempt += attempt
+            played += len(games)
+
+            progress_bar.update(len(games))
+            progress_bar.set_postfix(avg=f"{avg_attempt / played:.4f}")
     
-    tree.close()
+    if results is not None:
+        results.finish(run)
+    progress_bar.close()
     return result
     
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
 
-    # Solvers: Bayesian, Minimax, Heuristic, Random, Fixed
+    # Solvers: Bayesian, Minimax, Heuristic, Lookahead, Random, Fixed
     # (solver, search_all)
     solvers = [
         (Bayesian, True),
@@ -56,25 +191,82 @@ if __name__ == "__main__":
         (Minimax, True),
         #(Minimax, False),
         #(Heuristic, True),
+        #(Lookahead, True),
         (Heuristic, False),
         #(Random, False),
         (Fixed, False),
     ]
 
-    results = []
+    # Number of worker processes. 1 plays serially and trains the decision tree
+    workers = 1
+
+    # Serve guesses from an in-memory copy of a compiled tree instead of training it
+    snapshot = False
+
+    # File of every allowed guess, e.g. about 13k words. None allows only the answers
+    guesses_path = None
+
+    # Hard mode: every revealed hint must be used in later guesses (single board solvers)
+    hard = False
+
+    # Filtering backend: "matrix" (precomputed patterns) or "bitmask" (letter masks), same results
+    backend = "matrix"
+
+    # Store every answer in results.db, and resume interrupted runs of the same solvers. None disables
+    results_path = "results.db"
+
+    # Latency tables and a JSON report per solver in profile_dir. Serial runs only
+    profile = False
+    profile_dir = "profiles"
+
+    # Boards per game (4 for Quordle, 8 for Octordle) to benchmark MultiBoard instead of the solvers above
+    boards = 0
+    games = 500     # seeded answer tuples played by each multi-board solver
+    # (objective, search_all)
+    multiboard_solvers = [
+        ("entropy", True),
+        ("worst", True),
+    ]
+
+    results = ResultsDB(results_path) if results_path else None
     words = load_words()
+    guesses = load_words(guesses_path) if guesses_path else None
+
+    if boards:
+        agents = [MultiBoard(words, boards, objective, search_all, guesses=guesses) for objective, search_all in multiboard_solvers]
+    else:
+        agents = [solver(words, search_all, guesses=guesses, hard=hard, backend=backend) for solver, search_all in solvers]
     
-    for solver, search_all in solvers:
-        agent = solver(words, search_all)
-        tree = TreeDB(agent.__repr__())
+    for agent in agents:
+        profiler = Profiler(profile and (boards or workers == 1))
 
-        result = test_solver(agent, tree)
+        if boards:
+            profiler.attach(agent)
+            result = test_boards(agent, games)
+        elif workers > 1:
+            result = test_solver_parallel(agent, workers, results=results)
+        else:
+            tree = TreeSnapshot(agent.__repr__(), fallback=True, words_hash=agent.matrix.digest) if snapshot else TreeDB(agent.__repr__(), words_hash=agent.matrix.digest)
+            profiler.attach(agent, tree)
+            result = test_solver(agent, tree, results)
+
+        # Caches with a file are kept for the next run
+        if getattr(agent, "cache", None) is not None and agent.cache.path:
+            agent.cache.save()
+
+        if profiler.enabled:
+            print(profiler.table())
+            profiler.report(os.path.join(profile_dir, f"{agent}.json"), solver=repr(agent), result=dict(result))
+            profiler.detach()
 
         # Plot the results
         x, y = zip(*sorted(result.items()))
         print(f"y: {y}")
         plt.plot(x, y, label=agent, marker='o')
     
+    if results:
+        results.close()
+
     plt.xlabel("Attempts")
     plt.ylabel("Frequency")
 
@@ -0,0 +1,74 @@
+import hashlib
+import numpy as np
+from collections.abc import Sequence
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def words_digest(words):
+    # Fingerprint of a word list and its word length, used to share and validate caches
+    length = len(words[0]) if words else 0
+    text = str(length) + "\n" + "\n".join(words)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class WordStore(Sequence):
+    """
+    Word list encoded once for the solvers. Behaves like a read only list of strings.
+    Blank lines are skipped. Raises ValueError on words of mixed length, letters outside
+    A-Z or duplicates, reporting the line of the word among the given lines.
+    """
+    def __init__(self, words, source="word list"):
+        self.words = self.validate([word.strip().upper() for word in words], source)
+
+        self.length = len(self.words[0])
+        self.index = {word: i for i, word in enumerate(self.words)}
+        self.digest = words_digest(self.words)
+
+        # N x length letter codes (0 for A) and N x 26 letter counts
+        text = np.frombuffer("".join(self.words).encode(), dtype=np.uint8)
+        self.codes = (text - ord('A')).reshape(len(self.words), self.length)
+        self.counts = np.zeros((len(self.words), len(ALPHABET)), dtype=np.uint8)
+        rows = np.arange(len(self.words))
+        for i in range(self.length):
+            self.counts[rows, self.codes[:, i]] += 1
+
+    @classmethod
+    def load(cls, path="words.txt"):
+        with open(path, 'r') as f:
+            return cls(f.read().splitlines(), path)
+
+    def validate(self, lines, source):
+        # Words of the lines, numbered as in the source
+        words = [(line, word) for line, word in enumerate(lines, start=1) if word]
+        if not words:
+            raise ValueError(f"{source}: no words")
+
+        length = len(words[0][1])
+        seen = {}
+        for line, word in words:
+            if len(word) != length:
+                raise ValueError(f"{source}:{line}: '{word}' has {len(word)} letters, expected {length}")
+            if not all(c in ALPHABET for c in word):
+                raise ValueError(f"{source}:{line}: '{word}' has letters outside A-Z")
+            if word in seen:
+                raise ValueError(f"{source}:{line}: '{word}' duplicates line {seen[word]}")
+            seen[word] = line
+        return [word for _, word in words]
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, i):
+        return self.words[i]
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self)} words of {self.length} letters)"
+
+    def ids(self, words):
+        # Indices of the given words
+        return np.fromiter((self.index[word] for word in words), dtype=np.intp, count=len(words))
@@ -1,5 +1,10 @@
+import time
+import queue
+import threading
 import tkinter as tk
+import numpy as np
 from solvers import *
+from patterns import decode_feedback, pattern_count
 from decision_tree import TreeDB
 
 # --- Constants ---
@@ -7,7 +12,7 @@ SOLVERS = [Bayesian, Minimax, Heuristic, Random, Fixed]
 SOLVER_NAMES = [s.__name__ for s in SOLVERS]
 
 WORDS = load_words()
-WORD_LEN = len(WORDS[0])
+WORD_LEN = WORDS.length
 
 COLOR_MAP = {'green': 1, 'yellow': 0, 'black': -1}
 COLOR_CYCLE = {
@@ -16,76 +21,202 @@ COLOR_CYCLE = {
     'black': ('green', 'white'),
 }
 
+# Follow-up guesses computed ahead for the most likely feedback while the user enters colors
+LOOKAHEAD = 3
+POLL_MS = 50
+
+# --- Solver worker ---
+class SolverWorker(threading.Thread):
+    """
+    Computes the guesses off the Tk main loop. Only this thread touches the agent and the
+    decision tree. Results go back through a queue polled by the main loop.
+    """
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+
+        self.agent = None
+        self.tree = None
+        self.reset_game()
+
+    def reset_game(self):
+        # Agent states, tree cursors and guesses of every game history seen, keyed by history
+        self.states = {}
+        self.cursors = {}
+        self.guesses = {}
+
+    def run(self):
+        while (job := self.jobs.get()) is not None:
+            kind, job_id, *args = job
+            try:
+                if kind == "start":
+                    self.start_game(*args)
+                    continue
+
+                history, = args
+                self.results.put((job_id, self.guess_for(history), None))
+                self.compute_ahead(history)
+            except Exception as e:
+                self.results.put((job_id, None, e))
+
+        # Write the pending nodes of the decision tree
+        if self.tree:
+            self.tree.close()
+
+    def start_game(self, name, search_all, use_tree):
+        if self.agent is None or self.agent.__repr__() != name + ("All" if search_all else "Filtered"):
+            Solver = SOLVERS[SOLVER_NAMES.index(name)]
+            self.agent = Solver(WORDS, search_all)
+
+            if self.tree:
+                # Close the decision tree of the previous solver
+                self.tree.close()
+            self.tree = TreeDB(self.agent.__repr__(), words_hash=self.agent.matrix.digest) if use_tree else None
+        else:
+            self.agent.reset()
+
+        self.reset_game()
+        self.states[()] = self.agent.get_state()
+
+    def state_for(self, history):
+        # Agent state after the (guess, feedback) history
+        if history not in self.states:
+            guess, feedback = history[-1]
+            self.states[history] = self.agent.filter_state(self.state_for(history[:-1]), guess, list(feedback))
+        return self.states[history]
+
+    def guess_for(self, history):
+        if history in self.guesses:
+            return self.guesses[history]
+
+        self.agent.set_state(self.state_for(history))
+        if self.tree and self.agent.__repr__() != "RandomSolver":
+            if history and history[:-1] not in self.cursors:
+                self.guess_for(history[:-1])
+            cursor = self.cursors[history[:-1]] if history else self.tree.root()
+            feedback = list(history[-1][1]) if history else None
+            guess, self.cursors[history] = cursor.advance(feedback, self.agent.make_guess)
+        else:
+            guess = self.agent.make_guess()
+
+        self.guesses[history] = guess
+        return guess
+
+    def compute_ahead(self, history):
+        # Guess ahead for the most likely feedback, stopping as soon as a new job comes in
+        guess = self.guesses[history]
+        if not guess or guess not in self.agent.matrix.index:
+            return
+
+        ids = self.state_for(history)[0]
+        patterns = self.agent.matrix.patterns(self.agent.matrix.index[guess], ids)
+        counts = np.bincount(patterns, minlength=pattern_count(WORD_LEN))
+        counts[-1] = 0  # solved
+
+        for code in np.argsort(-counts, kind='stable')[:LOOKAHEAD]:
+            if not counts[code] or not self.jobs.empty():
+                return
+            feedback = tuple(decode_feedback(code, WORD_LEN))
+            self.guess_for(history + ((guess, feedback),))
+
 # --- Global variables ---
-agent = None
-tree = None
+worker = SolverWorker()
+job_id = 0      # id of the guess waiting for the worker, results of older jobs are dropped
+waiting = None  # start time of the pending guess
 attempt = None
-feedback = None
+history = None
 
 # --- Functions ---
 def start_game():
     """Starts or resets the game"""
-    global agent, tree, attempt
+    global attempt, history, job_id
     attempt = 0
+    history = ()
 
-    if agent is None or agent.__repr__() != f"{selected_solver.get()}{"All" if search_all.get() else "Filtered"}":
-        Solver = SOLVERS[SOLVER_NAMES.index(selected_solver.get())]
-
-        agent = Solver(WORDS, search_all.get())
-
-        if decision_tree.get():
-            tree = TreeDB(agent.__repr__())
-        elif tree:
-            # Close the decision tree if it was previously opened
-            tree.close()
-            tree = None
+    job_id += 1
+    worker.jobs.put(("start", job_id, selected_solver.get(), search_all.get(), decision_tree.get()))
 
-        start_button.config(text="New Game")
-        submit_button.config(text="> Submit Feedback <")
-
-    else:
-        agent.reset()
+    start_button.config(text="New Game")
+    submit_button.config(text="> Submit Feedback <")
 
     init_feedback()
     make_guess()
 
 def make_guess():
-    """Makes a guess and updates the UI"""
+    """Asks the worker for the next guess and waits for it without blocking the UI"""
     # Update attempts
-    global attempt
+    global attempt, job_id, waiting
     attempt += 1
-    result_label.config(text=f"Attempt {attempt}")
 
-    # Make guess
-    if decision_tree.get() and agent.__repr__() != "RandomSolver":
-        guess = tree.get_node(agent.make_guess, feedback)
-    else:
-        guess = agent.make_guess()
+    job_id += 1
+    waiting = time.time()
+    worker.jobs.put(("guess", job_id, history))
 
-    if not guess:
-        result_label.config(text="Error: No guess available")
-        return
+    submit_button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
+
+def poll_worker():
+    """Shows the guess once the worker has it, otherwise the time spent so far. Runs every POLL_MS"""
+    root.after(POLL_MS, poll_worker)
 
-    init_feedback(guess)
+    global waiting
+    while not worker.results.empty():
+        result_id, guess, error = worker.results.get()
+        if result_id != job_id or waiting is None:
+            continue    # cancelled or replaced
+        
+        waiting = None
+        submit_button.config(state=tk.NORMAL)
+        cancel_button.config(state=tk.DISABLED)
+
+        if error or not guess:
+            result_label.config(text=f"Error: {error or 'No guess available'}")
+        else:
+            result_label.config(text=f"Attempt {attempt}")
+            init_feedback(guess)
+
+    if waiting is not None:
+        result_label.config(text=f"Attempt {attempt}: thinking... {time.time() - waiting:.1f}s")
+
+def cancel_guess():
+    """Stops waiting for the pending guess. The worker drops it once it is done"""
+    global attempt, history, job_id, waiting
+    job_id += 1
+    waiting = None
+    attempt -= 1
+
+    submit_button.config(state=tk.NORMAL)
+    cancel_button.config(state=tk.DISABLED)
+
+    # Take back the last feedback, so submitting it again retries
+    if history:
+        history = history[:-1]
+        result_label.config(text="Cancelled, submit the feedback again to retry")
+    else:
+        result_label.config(text="Cancelled, press Start Game to retry")
 
 def submit_feedback():
-    """Processes user feedback and updates the solver"""
-    if agent is None:
+    """Processes user feedback and asks for the next guess"""
+    global attempt, history
+    if history is None:
+        result_label.config(text="Warning: Press Start Game first")
+        return
+
+    guess = "".join(button.cget("text") for button in feedback_buttons)
+    if not guess.strip():
         result_label.config(text="Warning: Press Start Game first")
         return
 
-    global feedback
     feedback = [COLOR_MAP[button.cget("bg")] for button in feedback_buttons]
 
     # Handle the case where Wordle is solved
     if feedback == [1] * WORD_LEN:
-        global attempt
         result_label.config(text=f"Solved in {attempt} attempts!")
         attempt = 0
         return
     
-    guess = "".join(button.cget("text") for button in feedback_buttons)
-    agent.filter_words(guess, feedback)
+    history += ((guess, tuple(feedback)),)
     make_guess()
 
 def init_feedback(guess=" " * WORD_LEN):
@@ -132,12 +263,24 @@ for i in range(WORD_LEN):
     button.pack(side=tk.LEFT, padx=1)
     feedback_buttons.append(button)
 
-# Submit Button
-submit_button = tk.Button(root, text="Submit Feedback", command=submit_feedback)
-submit_button.pack(pady=10)
+# Submit and Cancel Buttons
+action_frame = tk.Frame(root)
+action_frame.pack(pady=10)
+
+submit_button = tk.Button(action_frame, text="Submit Feedback", command=submit_feedback)
+submit_button.pack(side=tk.LEFT, padx=2)
+
+cancel_button = tk.Button(action_frame, text="Cancel", command=cancel_guess, state=tk.DISABLED)
+cancel_button.pack(side=tk.LEFT, padx=2)
 
 # Result Label
 result_label = tk.Label(root, text="")
 result_label.pack()
 
+worker.start()
+poll_worker()
 root.mainloop()
+
+# Let the worker finish its guess and write the pending nodes of the decision tree
+worker.jobs.put(None)
+worker.join(timeout=5)